@@ -0,0 +1,46 @@
+"""users: unique index on lower(email) for case-insensitive login
+
+Revision ID: 8c1f4e2a9d07
+Revises: 3214c019944f
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4e2a9d07'
+down_revision: Union[str, None] = '3214c019944f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_users_email_lower'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Если email, различающиеся только регистром, уже есть - миграция упадет,
+    # дубликаты нужно разобрать вручную.
+    if op.get_context().dialect.name == 'postgresql':
+        # CONCURRENTLY не блокирует запись в users, но не работает внутри транзакции
+        with op.get_context().autocommit_block():
+            # невалидный индекс после прерванной сборки мешает повторной
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+            op.create_index(
+                INDEX_NAME, 'users', [sa.text('lower(email)')],
+                unique=True, postgresql_concurrently=True,
+            )
+    else:
+        op.create_index(INDEX_NAME, 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(INDEX_NAME, table_name='users', postgresql_concurrently=True)
+    else:
+        op.drop_index(INDEX_NAME, table_name='users')
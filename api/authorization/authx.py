@@ -1,8 +1,14 @@
 from functools import lru_cache
-from typing import Annotated
-from authx import AuthX, AuthXConfig, TokenPayload
+from typing import Annotated, Any
+import jwt
+from authx import AuthX, AuthXConfig, RequestToken, TokenPayload
+from authx.exceptions import JWTDecodeError, RevokedTokenError
 from fastapi import Depends, Request
 from config import settings
+from exceptions.errors import ForbiddenError
+from .keys import KeyRing, SigningKey, get_key_ring
+from .revocation import RevocationListDep
+from .token_cache import TokenCache, get_token_cache
 
 
 config = AuthXConfig()
@@ -10,16 +16,134 @@ config.JWT_SECRET_KEY = settings.AUTH_SECRET_KEY
 config.JWT_TOKEN_LOCATION = ['headers']
 
 
+class KeyRingAuthX(AuthX):
+    '''AuthX, подписывающий активным ключом с kid и проверяющий ключом из заголовка токена'''
+
+    def __init__(self, config: AuthXConfig, keys: KeyRing) -> None:
+        super().__init__(config=config)
+        self.keys = keys
+
+    def _create_token(
+        self,
+        uid: str,
+        type: str,
+        fresh: bool = False,
+        headers: dict[str, Any] | None = None,
+        expiry: Any = None,
+        data: dict[str, Any] | None = None,
+        audience: Any = None,
+        **kwargs: Any,
+    ) -> str:
+        payload = self._create_payload(
+            uid=uid, type=type, fresh=fresh, expiry=expiry, data=data, audience=audience, **kwargs
+        )
+        key = self.keys.signing
+        if self.keys.headers:
+            headers = {**self.keys.headers, **(headers or {})}
+        return payload.encode(
+            key=key.private_key, algorithm=key.algorithm, headers=headers, data=data
+        )
+
+    def _decode_token(
+        self,
+        token: str,
+        verify: bool = True,
+        audience: Any = None,
+        issuer: str | None = None,
+    ) -> TokenPayload:
+        key = self._verification_key(token)
+        return TokenPayload.decode(
+            token=token,
+            key=key.public_key,
+            algorithms=[key.algorithm],
+            verify=verify,
+            audience=audience or self.config.JWT_DECODE_AUDIENCE,
+            issuer=issuer or self.config.JWT_DECODE_ISSUER,
+        )
+
+    def verify_token(
+        self,
+        token: RequestToken,
+        verify_type: bool = True,
+        verify_fresh: bool = False,
+        verify_csrf: bool = True,
+    ) -> TokenPayload:
+        key = self._verification_key(token.token)
+        return token.verify(
+            key=key.public_key,
+            # алгоритм задан ключом, а не заголовком токена
+            algorithms=[key.algorithm],
+            verify_fresh=verify_fresh,
+            verify_type=verify_type,
+            verify_csrf=verify_csrf,
+            audience=self.config.JWT_DECODE_AUDIENCE,
+            issuer=self.config.JWT_DECODE_ISSUER,
+        )
+
+    def _verification_key(self, token: str) -> SigningKey:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise JWTDecodeError(*e.args) from e
+        return self.keys.get(header.get('kid'))
+
+
 @lru_cache
-def get_auth() -> AuthX:
-    return AuthX(config=config)
+def get_auth() -> KeyRingAuthX:
+    return KeyRingAuthX(config=config, keys=get_key_ring())
 
 
 AuthxDep = Annotated[AuthX, Depends(get_auth)]
+TokenCacheDep = Annotated[TokenCache | None, Depends(get_token_cache)]
+
 
+async def get_payload(
+    request: Request, auth: AuthxDep, cache: TokenCacheDep, revocations: RevocationListDep
+) -> TokenPayload:
+    payload = await verify_access_token(request, auth, cache)
+    # отзыв проверяется и для закэшированных токенов; обычно ответ дает локальный фильтр
+    if await revocations.is_revoked(payload.jti, getattr(payload, 'fam', None)):
+        raise RevokedTokenError('Token has been revoked')
+    return payload
 
-async def get_payload(request: Request, auth: AuthxDep) -> TokenPayload:
-    return await auth.access_token_required(request)
+
+async def verify_access_token(
+    request: Request, auth: AuthX, cache: TokenCache | None
+) -> TokenPayload:
+    '''Проверяет токен доступа, проверенные payload берутся из кэша'''
+    if cache is None:
+        return await auth.access_token_required(request)
+
+    # MissingTokenError пробрасывается как и раньше
+    request_token = await auth.get_access_token_from_request(request)
+    if auth.is_token_in_blocklist(request_token.token):
+        raise RevokedTokenError('Token has been revoked')
+
+    # токены из cookies требуют CSRF проверки на каждый запрос, их не кэшируем
+    cacheable = request_token.location != 'cookies'
+    if cacheable and (payload := cache.get(request_token.token)) is not None:
+        return payload
+
+    # JWTDecodeError пробрасывается как и раньше
+    payload = auth.verify_token(
+        request_token,
+        verify_type=True,
+        verify_fresh=False,
+        verify_csrf=config.JWT_COOKIE_CSRF_PROTECT
+        and request.method.upper() in config.JWT_CSRF_METHODS,
+    )
+    if cacheable:
+        cache.set(request_token.token, payload)
+    return payload
 
 
 TokenPayloadDep = Annotated[TokenPayload, Depends(get_payload)]
+
+
+async def get_admin_payload(payload: TokenPayloadDep) -> TokenPayload:
+    if payload.sub not in settings.ADMIN_USERNAMES:
+        raise ForbiddenError('Admin access required')
+    return payload
+
+
+AdminPayloadDep = Annotated[TokenPayload, Depends(get_admin_payload)]
@@ -0,0 +1,120 @@
+'''Ключи подписи JWT.
+
+Ключи читаются и разбираются один раз: подпись и проверка получают готовые объекты
+cryptography, PEM не разбирается на каждый токен. Токен подписывается активным ключом,
+его kid записывается в заголовок; проверка выбирает ключ по kid, поэтому при ротации
+старые ключи остаются в списке, пока не истекут выданные ими токены.
+
+Генерация ключей:
+    openssl ecparam -name prime256v1 -genkey -noout | openssl pkcs8 -topk8 -nocrypt > es256.pem
+    openssl genpkey -algorithm ed25519 > ed25519.pem
+'''
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from authx.exceptions import JWTDecodeError
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+from config import settings
+
+
+# заголовок без kid - токен, выданный общим секретом (HS256)
+LEGACY_KID = None
+
+
+@dataclass(frozen=True, slots=True)
+class SigningKey:
+    kid: str | None
+    algorithm: str
+    private_key: Any
+    public_key: Any
+
+
+def read_pem(value: str) -> bytes:
+    '''Значение настройки - PEM целиком или путь к файлу с ним'''
+    if value.lstrip().startswith('-----BEGIN'):
+        return value.encode()
+    return Path(value).read_bytes()
+
+
+def load_key(kid: str, value: str) -> SigningKey:
+    '''Разбирает закрытый ключ и определяет алгоритм по его типу'''
+    private_key = serialization.load_pem_private_key(read_pem(value), password=None)
+    if isinstance(private_key, ec.EllipticCurvePrivateKey):
+        if not isinstance(private_key.curve, ec.SECP256R1):
+            raise ValueError(f'JWT key {kid}: only P-256 curve is supported')
+        algorithm = 'ES256'
+    elif isinstance(private_key, ed25519.Ed25519PrivateKey):
+        algorithm = 'EdDSA'
+    else:
+        raise ValueError(f'JWT key {kid}: only EC P-256 and Ed25519 keys are supported')
+    return SigningKey(kid, algorithm, private_key, private_key.public_key())
+
+
+def public_jwk(key: SigningKey) -> dict[str, Any]:
+    '''Открытая часть ключа в формате JWK'''
+    if key.algorithm == 'ES256':
+        jwk = ECAlgorithm.to_jwk(key.public_key, as_dict=True)
+    else:
+        jwk = OKPAlgorithm.to_jwk(key.public_key, as_dict=True)
+    return {**jwk, 'kid': key.kid, 'alg': key.algorithm, 'use': 'sig'}
+
+
+class KeyRing:
+    '''Ключи подписи и проверки, JWKS кодируется один раз'''
+
+    def __init__(
+        self,
+        keys: dict[str, str],
+        signing_kid: str | None,
+        secret: str,
+        accept_legacy: bool,
+    ) -> None:
+        self._keys: dict[str | None, SigningKey] = {
+            kid: load_key(kid, value) for kid, value in keys.items()
+        }
+        if accept_legacy or not self._keys:
+            self._keys[LEGACY_KID] = SigningKey(LEGACY_KID, 'HS256', secret, secret)
+
+        if not keys:
+            # без асимметричных ключей подпись общим секретом, как раньше
+            signing_kid = LEGACY_KID
+        elif signing_kid is None:
+            # по умолчанию подписывает последний добавленный ключ
+            signing_kid = list(keys)[-1]
+        elif signing_kid not in keys:
+            raise ValueError(f'JWT signing key {signing_kid} is not in JWT_KEYS')
+        self.signing = self._keys[signing_kid]
+
+        jwks = {'keys': [public_jwk(key) for key in self._keys.values() if key.kid]}
+        self.jwks = json.dumps(jwks, separators=(',', ':')).encode()
+        self.etag = '"' + hashlib.blake2b(self.jwks, digest_size=16).hexdigest() + '"'
+
+    @property
+    def headers(self) -> dict[str, str] | None:
+        '''Заголовки JWT для подписи активным ключом'''
+        return {'kid': self.signing.kid} if self.signing.kid else None
+
+    def get(self, kid: str | None) -> SigningKey:
+        '''Ключ проверки по kid из заголовка токена'''
+        key = self._keys.get(kid)
+        if key is None:
+            raise JWTDecodeError(f'Unknown signing key {kid}')
+        return key
+
+
+@lru_cache
+def get_key_ring() -> KeyRing:
+    return KeyRing(
+        keys=settings.JWT_KEYS,
+        signing_kid=settings.JWT_SIGNING_KID,
+        secret=settings.AUTH_SECRET_KEY,
+        accept_legacy=settings.JWT_ACCEPT_HS256,
+    )
+
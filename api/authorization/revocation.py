@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from contextlib import suppress
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from config import settings
+from exceptions.errors import ServiceOverloadedError
+from redis_client.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+# отозванные идентификаторы (jti токенов и семейства refresh токенов), score - время истечения
+REVOKED_KEY = 'revoked_tokens'
+# канал, по которому воркеры узнают об отзыве
+REVOKED_CHANNEL = 'revoked_tokens'
+
+
+def refresh_used_key(jti: str) -> str:
+    return f'refresh_used:{jti}'
+
+
+class BloomFilter:
+    '''Фильтр Блума: "нет" - точно нет, "да" - возможно (нужна проверка в Redis)'''
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        # двойное хеширование: k позиций из двух 64-битных половин одного дайджеста
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        if item in self:
+            # отзыв приходит и из канала, повторно не считаем
+            return
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    '''Список отозванных токенов в Redis с фильтром Блума в каждом процессе.
+
+    Фильтр заполняется из Redis при подписке на канал отзыва и дополняется сообщениями
+    из него, поэтому частый случай "не отозван" решается без обращения к Redis. В Redis
+    идет только попадание в фильтр. Пока фильтр не синхронизирован, проверка идет в Redis.
+
+    Если Redis недоступен, ответ дает последний синхронизированный фильтр, но не дольше
+    stale_grace секунд после потери синхронизации: отзывы за это время могут быть не видны.
+    Затем, как и без фильтра, проверка отклоняется с ServiceOverloadedError.
+    '''
+
+    def __init__(
+        self,
+        redis: Redis,
+        capacity: int,
+        error_rate: float,
+        rebuild_interval: float,
+        stale_grace: float,
+        retry_delay: float = 1,
+    ) -> None:
+        self.redis = redis
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.stale_grace = stale_grace
+        self.retry_delay = retry_delay
+        self.synced = False
+        self.unavailable = 0
+        # когда фильтр перестал обновляться; None - синхронизирован или еще не строился
+        self._stale_since: float | None = None
+        self.local_checks = 0
+        self.redis_checks = 0
+        self.false_positives = 0
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._listener: asyncio.Task | None = None
+
+    async def is_revoked(self, *ids: str | None) -> bool:
+        '''Отозван ли хотя бы один из идентификаторов.
+
+        Без Redis и без пригодного фильтра - ServiceOverloadedError.
+        '''
+        ids = tuple(item for item in ids if item)
+        if not ids:
+            return False
+        usable = self._bloom_usable()
+        maybe_revoked = any(item in self._bloom for item in ids)
+        if usable and not maybe_revoked:
+            self.local_checks += 1
+            return False
+
+        self.redis_checks += 1
+        try:
+            scores = await self.redis.zmscore(REVOKED_KEY, list(ids))
+        except RedisError as e:
+            logger.warning('Не удалось проверить отзыв токена: %s', e)
+            if usable:
+                # попадание в фильтр без проверки в Redis считается отзывом
+                return maybe_revoked
+            self.unavailable += 1
+            raise ServiceOverloadedError('Token revocation list is unavailable') from e
+        now = time.time()
+        revoked = any(score is not None and score > now for score in scores)
+        if self.synced and not revoked:
+            self.false_positives += 1
+        return revoked
+
+    async def revoke(self, item: str, expires_at: float) -> None:
+        '''Отзывает идентификатор до expires_at и оповещает остальные процессы'''
+        self._bloom.add(item)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            # отзыв продлевается, но не сокращается
+            pipe.zadd(REVOKED_KEY, {item: expires_at}, gt=True)
+            pipe.publish(REVOKED_CHANNEL, item)
+            await pipe.execute()
+
+    async def use_refresh(self, jti: str, expires_at: float) -> bool:
+        '''Отмечает refresh токен использованным; False - токен уже использовали'''
+        ttl = max(1, math.ceil(expires_at - time.time()))
+        return bool(await self.redis.set(refresh_used_key(jti), 1, nx=True, ex=ttl))
+
+    def start(self) -> None:
+        '''Запускает фоновую синхронизацию фильтра'''
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+        self.synced = False
+        self._stale_since = None
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'synced': int(self.synced),
+            'bloom_items': self._bloom.count,
+            'local_checks': self.local_checks,
+            'redis_checks': self.redis_checks,
+            'false_positives': self.false_positives,
+            'unavailable': self.unavailable,
+        }
+
+    def _bloom_usable(self) -> bool:
+        '''Можно ли отвечать "не отозван" по фильтру'''
+        if self.synced:
+            return True
+        return (
+            self._stale_since is not None
+            and time.monotonic() - self._stale_since < self.stale_grace
+        )
+
+    def _mark_stale(self) -> None:
+        if self.synced:
+            self.synced = False
+            self._stale_since = time.monotonic()
+
+    async def _listen(self) -> None:
+        '''Подписка на канал отзыва; после разрыва фильтр строится заново'''
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                # сначала подписка, затем загрузка списка: отзыв между ними не потеряется
+                await pubsub.subscribe(REVOKED_CHANNEL)
+                await self._rebuild()
+                rebuild_at = time.monotonic() + self.rebuild_interval
+                while True:
+                    message = await pubsub.get_message(timeout=1)
+                    if message is not None:
+                        self._bloom.add(message['data'])
+                    if time.monotonic() >= rebuild_at:
+                        # фильтр не умеет удалять, истекшие отзывы уходят при перестроении
+                        await self._rebuild()
+                        rebuild_at = time.monotonic() + self.rebuild_interval
+            except Exception as e:
+                # любая ошибка только перезапускает подписку: без слушателя фильтр устареет навсегда
+                self._mark_stale()
+                logger.warning('Синхронизация списка отзыва прервана: %r', e)
+                await asyncio.sleep(self.retry_delay)
+            finally:
+                with suppress(Exception):
+                    await pubsub.aclose()
+
+    async def _rebuild(self) -> None:
+        '''Заполняет новый фильтр действующими отзывами из Redis'''
+        now = time.time()
+        await self.redis.zremrangebyscore(REVOKED_KEY, '-inf', now)
+        items = await self.redis.zrangebyscore(REVOKED_KEY, now, '+inf')
+        bloom = BloomFilter(max(self.capacity, 2 * len(items)), self.error_rate)
+        for item in items:
+            bloom.add(item)
+        self._bloom = bloom
+        self.synced = True
+        self._stale_since = None
+
+
+@lru_cache
+def get_revocation_list() -> RevocationList:
+    return RevocationList(
+        redis=get_redis(),
+        capacity=settings.REVOCATION_BLOOM_CAPACITY,
+        error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+        rebuild_interval=settings.REVOCATION_REBUILD_INTERVAL,
+        stale_grace=settings.REVOCATION_STALE_GRACE,
+    )
+
+
+RevocationListDep = Annotated[RevocationList, Depends(get_revocation_list)]
@@ -0,0 +1,72 @@
+import hashlib
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from authx import TokenPayload
+
+from config import settings
+
+
+class TokenCache:
+    '''LRU + TTL кэш проверенных payload токенов доступа'''
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[bytes, tuple[float, TokenPayload]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def make_key(token: str) -> bytes:
+        '''Ключ кэша - дайджест токена, сам токен в памяти не хранится'''
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> TokenPayload | None:
+        '''Возвращает payload, если он есть в кэше и не истек'''
+        key = self.make_key(token)
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, payload = item
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def set(self, token: str, payload: TokenPayload) -> None:
+        '''Сохраняет payload, запись не живет дольше exp токена'''
+        expires_at = time.time() + self.ttl
+        if payload.exp is not None:
+            expires_at = min(expires_at, payload.expiry_datetime.timestamp())
+
+        key = self.make_key(token)
+        self._data[key] = (expires_at, payload)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        '''Очищает кэш'''
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        '''Счетчики попаданий и промахов'''
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+@lru_cache
+def get_token_cache() -> TokenCache | None:
+    if not settings.TOKEN_CACHE_ENABLED:
+        return None
+    return TokenCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
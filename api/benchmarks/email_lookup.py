@@ -0,0 +1,115 @@
+'''Поиск пользователя по email без учета регистра на растущей таблице.
+
+Таблица заполняется до каждого размера из --sizes, на каждом размере замеряется
+QueriesService.get_user_by_email (индекс ix_users_email_lower) и, для сравнения,
+тот же поиск выражением, которое индекс использовать не может. План запроса
+проверяется: если lower(email) не попадает в индекс, бенчмарк падает.
+
+Запуск из каталога api: python -m benchmarks.email_lookup --sizes 10000,100000,1000000,10000000
+'''
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from database.models.base import Base
+from database.models.user import User
+from database.queries import USER_BY_EMAIL_QUERY, USER_RECORD_COLUMNS, QueriesService
+
+
+INDEX_NAME = 'ix_users_email_lower'
+# заведомо без индекса: выражение отличается от индексированного lower(email)
+SCAN_QUERY = select(*USER_RECORD_COLUMNS).where(
+    func.lower(User.email + '') == func.lower(bindparam('email'))
+)
+PASSWORD = '$2b$04$' + 'a' * 53
+
+
+def email(i: int) -> str:
+    return f'User{i}@Example.com'
+
+
+async def fill(engine: AsyncEngine, start: int, stop: int, chunk: int = 50_000) -> None:
+    for first in range(start, stop, chunk):
+        rows = [
+            {'username': f'user{i}', 'email': email(i), 'password': PASSWORD}
+            for i in range(first, min(first + chunk, stop))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(User), rows)
+
+
+async def query_plan(engine: AsyncEngine) -> str:
+    compiled = USER_BY_EMAIL_QUERY.compile(engine)
+    prefix = 'EXPLAIN QUERY PLAN' if engine.dialect.name == 'sqlite' else 'EXPLAIN'
+    async with engine.connect() as conn:
+        rows = await conn.exec_driver_sql(f'{prefix} {compiled}', tuple(['x'] * len(compiled.params)))
+        return ' | '.join(' '.join(str(value) for value in row) for row in rows)
+
+
+async def measure(session_factory, size: int, lookups: int) -> float:
+    '''Среднее время поиска в микросекундах; email ищется в другом регистре'''
+    targets = [email(random.randrange(size)).lower() for _ in range(lookups)]
+    async with session_factory() as session:
+        service = QueriesService(db=session)
+        start = time.perf_counter()
+        for target in targets:
+            assert await service.get_user_by_email(target) is not None
+        return (time.perf_counter() - start) / lookups * 1e6
+
+
+async def measure_scan(session: AsyncSession, size: int, lookups: int) -> float:
+    start = time.perf_counter()
+    for _ in range(lookups):
+        target = email(random.randrange(size)).upper()
+        assert (await session.execute(SCAN_QUERY, {'email': target})).first() is not None
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--scan-lookups', type=int, default=5, help='0 - без замера полного скана')
+    parser.add_argument('--url', help='БД для замера (по умолчанию временный SQLite файл)')
+    args = parser.parse_args()
+
+    url = args.url or f'sqlite+aiosqlite:///{tempfile.mkdtemp(prefix="quickstart-email-")}/users.db'
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    plan = await query_plan(engine)
+    print(f'plan: {plan}')
+    if INDEX_NAME not in plan:
+        raise SystemExit(f'lookup by email does not use {INDEX_NAME}')
+
+    print(f'{"rows":>10} {"fill s":>8} {"index us":>9} {"scan us":>10}')
+    filled = 0
+    for size in sorted(int(size) for size in args.sizes.split(',')):
+        start = time.perf_counter()
+        await fill(engine, filled, size)
+        filled = size
+        fill_s = time.perf_counter() - start
+
+        indexed = await measure(session_factory, size, args.lookups)
+        scan = ''
+        if args.scan_lookups:
+            async with session_factory() as session:
+                scan = f'{await measure_scan(session, size, args.scan_lookups):.0f}'
+        print(f'{size:>10} {fill_s:>8.1f} {indexed:>9.1f} {scan:>10}', flush=True)
+
+    await engine.dispose()
+    if not args.url:
+        os.remove(url.split(':///', 1)[1])
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+'''Микробенчмарк подписи и проверки JWT: HS256, ES256 и EdDSA; для асимметричных ключей
+PEM, разбираемый на каждый вызов, против готового объекта ключа (как в KeyRing).
+
+Запуск из каталога api: python -m benchmarks.jwt --iterations 2000
+'''
+import argparse
+import time
+from typing import Any, Callable
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+
+PAYLOAD = {'sub': 'benchmark', 'type': 'access', 'fam': 'f' * 32, 'exp': 4102444800}
+
+
+def pem(private_key: Any) -> tuple[bytes, bytes]:
+    return (
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ),
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ),
+    )
+
+
+def measure(iterations: int, func: Callable[[], Any]) -> float:
+    '''Среднее время вызова в микросекундах'''
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    secret = 'benchmark-secret-key-of-reasonable-length'
+    es256 = ec.generate_private_key(ec.SECP256R1())
+    eddsa = ed25519.Ed25519PrivateKey.generate()
+    cases = [('HS256', 'HS256', secret, secret)]
+    for name, algorithm, key in (('ES256', 'ES256', es256), ('EdDSA', 'EdDSA', eddsa)):
+        cases.append((f'{name} pem', algorithm, *pem(key)))
+        cases.append((f'{name} cached', algorithm, key, key.public_key()))
+
+    print(f'{"case":<16} {"sign us":>9} {"verify us":>10}')
+    for name, algorithm, private_key, public_key in cases:
+        token = jwt.encode(PAYLOAD, private_key, algorithm, headers={'kid': 'k1'})
+        sign = measure(
+            args.iterations,
+            lambda: jwt.encode(PAYLOAD, private_key, algorithm, headers={'kid': 'k1'}),
+        )
+        verify = measure(
+            args.iterations, lambda: jwt.decode(token, public_key, algorithms=[algorithm])
+        )
+        print(f'{name:<16} {sign:>9.1f} {verify:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
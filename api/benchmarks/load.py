@@ -0,0 +1,418 @@
+'''Нагрузочный тест сценария регистрации и входа на локальных заменах зависимостей.
+
+SQLite (aiosqlite) во временном каталоге, fakeredis (или локальный Redis через --redis),
+брокер Celery в памяти с выполнением задач на месте и SMTP сервер aiosmtpd.
+Каждый виртуальный пользователь проходит send-code -> verify-code -> login -> refresh ->
+/protected, результаты сохраняются в JSON для сравнения между коммитами.
+
+Запуск из каталога api:
+    python -m benchmarks.load --users 200 --concurrency 20
+    python -m benchmarks.load --hasher-executor process --hasher-workers 4
+    python -m benchmarks.load --compare benchmarks/results/load-<commit>.json
+'''
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+
+SMTP_HOST, SMTP_PORT = '127.0.0.1', 8025
+HTTP_HOST, HTTP_PORT = '127.0.0.1', 8089
+FAKE_REDIS_HOST, FAKE_REDIS_PORT = '127.0.0.1', 6390
+ENDPOINTS = ('send-code', 'verify-code', 'login', 'refresh', 'protected')
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    '''Настройки приложения до его импорта: все зависимости локальные'''
+    database_url = f'sqlite+aiosqlite:///{workdir}/bench.db'
+    os.environ.update({
+        'DEBUG': 'false',
+        'DATABASE_DEV_URL': database_url,
+        'DATABASE_PROD_URL': database_url,
+        'AUTH_SECRET_KEY': 'benchmark',
+        'CELERY_BROKER_URL': 'memory://',
+        'SMTP_HOST': SMTP_HOST,
+        'SMTP_PORT': str(SMTP_PORT),
+        'SMTP_USER': 'bench@example.com',
+        'SMTP_PASSWORD': 'benchmark',
+        'SMTP_STARTTLS': 'false',
+        'EMAIL_TRANSPORT': args.email_transport,
+        'RATE_LIMIT_ENABLED': str(args.rate_limit).lower(),
+        # fakeredis не отвечает на PING проверки здоровья соединения
+        'REDIS_HEALTH_CHECK_INTERVAL': '0',
+    })
+    # пул хеширования паролей: без флагов - значения из config.py
+    if args.hasher_executor:
+        os.environ['PASSWORD_HASHER_EXECUTOR'] = args.hasher_executor
+    if args.hasher_workers:
+        os.environ['PASSWORD_HASHER_WORKERS'] = str(args.hasher_workers)
+    if args.redis != 'fake':
+        host, _, port = args.redis.partition(':')
+        os.environ['REDIS_HOST'] = host
+        os.environ['REDIS_PORT'] = port or '6379'
+
+
+def use_fake_redis() -> None:
+    '''Подменяет соединения пула Redis на fakeredis, клиент и метрики остаются прежними'''
+    import fakeredis
+    from fakeredis.aioredis import FakeConnection
+    from redis.asyncio import BlockingConnectionPool
+
+    import redis_client.redis
+
+    redis_client.redis.BlockingConnectionPool = partial(  # type: ignore[misc]
+        BlockingConnectionPool, connection_class=FakeConnection, server=fakeredis.FakeServer()
+    )
+
+
+def start_fake_redis_server() -> str:
+    '''fakeredis по TCP: общий Redis для воркеров server.py'''
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer((FAKE_REDIS_HOST, FAKE_REDIS_PORT))
+    # открытые клиентами соединения не должны задерживать выход из процесса
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'{FAKE_REDIS_HOST}:{FAKE_REDIS_PORT}'
+
+
+class Sink:
+    '''SMTP сервер, который только считает письма'''
+
+    def __init__(self) -> None:
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+class Recorder:
+    '''Задержки и статусы ответов по сценариям'''
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.failed_flows = 0
+
+    async def request(
+        self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+
+async def user_flow(
+    client: httpx.AsyncClient, recorder: Recorder, redis, index: int, protected_calls: int
+) -> None:
+    '''Полный сценарий одного пользователя, останавливается на первой ошибке'''
+    from redis_client.verify_codes import VerifyCodeStore
+
+    creds = {
+        'username': f'bench{index}',
+        'email': f'bench{index}@example.com',
+        'password': 'benchmark-password',
+    }
+    response = await recorder.request(
+        client, 'send-code', 'POST', '/api/auth/registration/send-code', json=creds
+    )
+    if response.status_code != 200:
+        recorder.failed_flows += 1
+        return
+
+    # код берется из Redis, куда его положил сервис, а не из письма
+    code_key, _ = VerifyCodeStore.keys(creds['email'])
+    code = int(await redis.hget(code_key, 'code'))
+    response = await recorder.request(
+        client, 'verify-code', 'POST', '/api/auth/registration/verify-code',
+        json={'email': creds['email'], 'code': code},
+    )
+    if response.status_code != 200:
+        recorder.failed_flows += 1
+        return
+
+    response = await recorder.request(client, 'login', 'POST', '/api/auth/login', json=creds)
+    if response.status_code != 200:
+        recorder.failed_flows += 1
+        return
+    tokens = response.json()['data']
+
+    response = await recorder.request(
+        client, 'refresh', 'POST', '/api/auth/refresh',
+        json={'refresh_token': tokens['refresh_token']},
+    )
+    if response.status_code != 200:
+        recorder.failed_flows += 1
+        return
+    access_token = response.json()['data']['access_token']
+
+    for _ in range(protected_calls):
+        await recorder.request(
+            client, 'protected', 'GET', '/protected',
+            headers={'Authorization': f'Bearer {access_token}'},
+        )
+
+
+@asynccontextmanager
+async def serve_asgi(args: argparse.Namespace) -> AsyncIterator[httpx.AsyncClient]:
+    '''Приложение в этом же процессе, запросы без сети'''
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app), base_url='http://bench', timeout=60
+        ) as client:
+            yield client
+
+
+@asynccontextmanager
+async def serve_uvicorn(args: argparse.Namespace) -> AsyncIterator[httpx.AsyncClient]:
+    '''Один процесс uvicorn в этом же event loop, запросы по HTTP'''
+    import uvicorn
+
+    import main
+
+    config = uvicorn.Config(
+        main.app, host=HTTP_HOST, port=HTTP_PORT, log_level='warning', lifespan='on'
+    )
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        async with http_client(args) as client:
+            yield client
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+@asynccontextmanager
+async def serve_launcher(args: argparse.Namespace) -> AsyncIterator[httpx.AsyncClient]:
+    '''Отдельный процесс server.py с args.workers воркерами, вывод - в server.log рабочего каталога'''
+    log = open(Path(args.workdir) / 'server.log', 'w')
+    process = subprocess.Popen(
+        [
+            sys.executable, 'server.py', '--host', HTTP_HOST, '--port', str(HTTP_PORT),
+            '--workers', str(args.workers), '--max-requests', '0',
+        ],
+        cwd=Path(__file__).parent.parent,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        async with http_client(args) as client:
+            # каждый воркер прогревается сам; ждем, пока подряд ответят готовностью
+            ready = 0
+            while ready < args.workers * 4:
+                try:
+                    response = await client.get('/health/ready')
+                    ready = ready + 1 if response.status_code == 200 else 0
+                except httpx.TransportError:
+                    ready = 0
+                if not ready:
+                    await asyncio.sleep(0.2)
+            yield client
+    finally:
+        process.send_signal(signal.SIGTERM)
+        await asyncio.to_thread(process.wait)
+        log.close()
+
+
+def http_client(args: argparse.Namespace) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=f'http://{HTTP_HOST}:{HTTP_PORT}',
+        limits=httpx.Limits(max_connections=args.concurrency),
+        timeout=60,
+    )
+
+
+SERVERS = {'asgi': serve_asgi, 'uvicorn': serve_uvicorn, 'launcher': serve_launcher}
+
+
+async def run_load(args: argparse.Namespace) -> tuple[Recorder, float]:
+    from celery_client.tasks import celery_app
+    from database.connections import get_db_instance
+    from database.models.base import Base
+    from database.models.user import User  # noqa: F401 - регистрирует таблицу в metadata
+    from redis_client.redis import get_redis
+
+    # брокер в памяти никто не читает - задачи выполняются прямо при публикации
+    celery_app.conf.task_always_eager = True
+
+    db = get_db_instance()
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    redis = get_redis()
+
+    async def limited(client: httpx.AsyncClient, index: int) -> None:
+        async with semaphore:
+            await user_flow(client, recorder, redis, index, args.protected_calls)
+
+    try:
+        async with SERVERS[args.server](args) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(limited(client, index) for index in range(args.users)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await db.dispose()
+    return recorder, elapsed
+
+
+def percentile(values: list[float], percent: float) -> float:
+    '''Перцентиль по ближайшему рангу'''
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict[str, dict]:
+    result = {}
+    for endpoint in ENDPOINTS:
+        latencies = recorder.latencies.get(endpoint)
+        if not latencies:
+            continue
+        statuses = recorder.statuses[endpoint]
+        result[endpoint] = {
+            'requests': len(latencies),
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'throughput_rps': len(latencies) / elapsed,
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': max(latencies) * 1000,
+        }
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_report(report: dict) -> None:
+    print(f'{"endpoint":<12} {"req":>6} {"err":>5} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for endpoint, stats in report['endpoints'].items():
+        print(
+            f'{endpoint:<12} {stats["requests"]:>6} {stats["errors"]:>5} '
+            f'{stats["throughput_rps"]:>8.1f} {stats["p50_ms"]:>8.1f} '
+            f'{stats["p95_ms"]:>8.1f} {stats["p99_ms"]:>8.1f}'
+        )
+    print(
+        f'{report["flows"]["completed"]}/{report["flows"]["total"]} flows in '
+        f'{report["elapsed_s"]:.2f}s, {report["emails_delivered"]} emails delivered'
+    )
+
+
+def print_comparison(baseline: dict, current: dict) -> None:
+    '''Изменение пропускной способности и перцентилей относительно baseline'''
+    print(f'baseline {baseline["meta"]["commit"]} -> current {current["meta"]["commit"]}')
+    print(f'{"endpoint":<12} {"metric":<15} {"baseline":>10} {"current":>10} {"change":>8}')
+    for endpoint, stats in current['endpoints'].items():
+        old = baseline['endpoints'].get(endpoint)
+        if old is None:
+            continue
+        for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            change = (stats[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(
+                f'{endpoint:<12} {metric:<15} {old[metric]:>10.1f} '
+                f'{stats[metric]:>10.1f} {change:>+7.1f}%'
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100, help='количество сценариев')
+    parser.add_argument('--concurrency', type=int, default=10, help='одновременных сценариев')
+    parser.add_argument('--protected-calls', type=int, default=10, help='запросов /protected на сценарий')
+    parser.add_argument('--server', choices=tuple(SERVERS), default='asgi',
+                        help='asgi - без сети, uvicorn - через HTTP на localhost, '
+                             'launcher - server.py с --workers процессами')
+    parser.add_argument('--workers', type=int, default=1, help='воркеров server.py (launcher)')
+    parser.add_argument('--hasher-executor', choices=('thread', 'process'),
+                        help='PASSWORD_HASHER_EXECUTOR')
+    parser.add_argument('--hasher-workers', type=int,
+                        help='PASSWORD_HASHER_WORKERS (для launcher - на каждый воркер)')
+    parser.add_argument('--redis', default='fake', help='fake или host:port локального Redis')
+    parser.add_argument('--email-transport', choices=('celery', 'smtp'), default='celery')
+    parser.add_argument('--rate-limit', action='store_true', help='не отключать rate limit')
+    parser.add_argument('--output', type=Path, help='файл результатов (по умолчанию results/load-<commit>.json)')
+    parser.add_argument('--compare', type=Path, help='JSON предыдущего запуска для сравнения')
+    args = parser.parse_args()
+
+    workdir = args.workdir = tempfile.mkdtemp(prefix='quickstart-bench-')
+    if args.server == 'launcher':
+        # процессы не разделяют память: нужен Redis по сети, а брокер в памяти
+        # воркера никто не прочитает, поэтому почта уходит напрямую по SMTP
+        args.email_transport = 'smtp'
+        if args.redis == 'fake':
+            args.redis = start_fake_redis_server()
+    configure_environment(args, workdir)
+    if args.redis == 'fake':
+        use_fake_redis()
+
+    from aiosmtpd.controller import Controller
+
+    sink = Sink()
+    controller = Controller(sink, hostname=SMTP_HOST, port=SMTP_PORT)
+    controller.start()
+    try:
+        recorder, elapsed = asyncio.run(run_load(args))
+    finally:
+        controller.stop()
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {key: str(value) for key, value in vars(args).items()},
+        },
+        'elapsed_s': elapsed,
+        'flows': {'total': args.users, 'completed': args.users - recorder.failed_flows},
+        'emails_delivered': sink.received,
+        'endpoints': summarize(recorder, elapsed),
+    }
+    print_report(report)
+
+    output = args.output or RESULTS_DIR / f'load-{commit}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f'results: {output}')
+
+    if args.compare is not None:
+        print_comparison(json.loads(args.compare.read_text()), report)
+
+
+if __name__ == '__main__':
+    main()
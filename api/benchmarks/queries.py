@@ -0,0 +1,81 @@
+'''Микробенчмарк чтения пользователя: ORM сущность против Core проекции UserRecord.
+
+Запуск из каталога api: python -m benchmarks.queries --users 10000 --lookups 5000
+'''
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.models.base import Base
+from database.models.user import User
+from database.queries import QueriesService
+
+
+async def orm_lookup(session: AsyncSession, username: str) -> str | None:
+    '''Прежний путь: select(User) с гидрацией ORM сущности'''
+    result = await session.execute(select(User).where(User.username == username))
+    user = result.scalar_one_or_none()
+    return None if user is None else user.password
+
+
+async def core_lookup(session: AsyncSession, username: str) -> str | None:
+    '''Новый путь: Core запрос без кэша и single-flight'''
+    record = await QueriesService(db=session).get_user_by_username(username)
+    return None if record is None else record.password
+
+
+async def measure(name, func, session_factory, usernames) -> None:
+    async with session_factory() as session:
+        # прогрев кэша компиляции
+        for username in usernames[:100]:
+            await func(session, username)
+            session.expunge_all()
+
+        start = time.perf_counter()
+        for username in usernames:
+            await func(session, username)
+            session.expunge_all()
+        per_call = (time.perf_counter() - start) / len(usernames) * 1e6
+
+        # пиковое выделение памяти на один запрос, отдельным проходом (tracemalloc искажает время)
+        tracemalloc.start()
+        peaks = []
+        for username in usernames[:500]:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await func(session, username)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            session.expunge_all()
+        tracemalloc.stop()
+
+    print(f'{name:<6} {per_call:>8.1f} us/lookup  {sum(peaks) / len(peaks) / 1024:>6.1f} KiB peak/lookup')
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--lookups', type=int, default=5_000)
+    args = parser.parse_args()
+
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'x' * 60}
+            for i in range(args.users)
+        ])
+
+    usernames = [f'user{random.randrange(args.users)}' for _ in range(args.lookups)]
+    await measure('orm', orm_lookup, session_factory, usernames)
+    await measure('core', core_lookup, session_factory, usernames)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+'''Микробенчмарк сборки ответов: JSONResponse(model_dump()) и сериализация через response_model
+против ModelResponse (pydantic-core сразу в байты) и заранее закодированных ошибок.
+
+Запуск из каталога api: python -m benchmarks.responses --iterations 50000
+'''
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from schemes.responses import (
+    ApiResponse, ModelResponse, PreparedResponse, TokensData, TokensResponse
+)
+
+
+TOKENS = TokensData(access_token='a' * 180, refresh_token='r' * 180)
+INVALID_TOKEN = PreparedResponse(401, 'Invalid token')
+RESPONSE_FIELD = create_model_field(name='Response', type_=ApiResponse)
+
+
+def error_model_dump() -> None:
+    '''Прежний путь ошибки: модель -> dict -> stdlib json'''
+    JSONResponse(
+        status_code=401, content=ApiResponse(result='error', message='Invalid token').model_dump()
+    )
+
+
+def error_prepared() -> None:
+    INVALID_TOKEN()
+
+
+async def success_response_model() -> None:
+    '''Прежний путь успеха: FastAPI валидирует по response_model, jsonable_encoder, stdlib json'''
+    model = ApiResponse(
+        result='ok',
+        message='The tokens are located in the data of this response',
+        data={'access_token': TOKENS.access_token, 'refresh_token': TOKENS.refresh_token},
+    )
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=model)
+    JSONResponse(content)
+
+
+async def success_model_response() -> None:
+    ModelResponse(
+        TokensResponse(
+            result='ok',
+            message='The tokens are located in the data of this response',
+            data=TOKENS,
+        )
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=50_000)
+    args = parser.parse_args()
+
+    for name, func in (('error: model_dump + json', error_model_dump), ('error: prepared', error_prepared)):
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            func()
+        print(f'{name:<32} {(time.perf_counter() - start) / args.iterations * 1e6:>7.2f} us')
+
+    for name, func in (
+        ('success: response_model + json', success_response_model),
+        ('success: ModelResponse', success_model_response),
+    ):
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            await func()
+        print(f'{name:<32} {(time.perf_counter() - start) / args.iterations * 1e6:>7.2f} us')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+'''Бенчмарк отправки почты воркером Celery против локального SMTP сервера (aiosmtpd).
+
+Запуск из каталога api: python -m benchmarks.smtp --messages 500
+'''
+import argparse
+import os
+import time
+from smtplib import SMTP
+
+from aiosmtpd.controller import Controller
+
+HOST, PORT = '127.0.0.1', 8025
+
+# локальный сервер без TLS и авторизации
+os.environ['SMTP_HOST'] = HOST
+os.environ['SMTP_PORT'] = str(PORT)
+os.environ['SMTP_STARTTLS'] = 'false'
+
+from celery_client.smtp import SMTPPool, build_message  # noqa: E402
+
+
+class Sink:
+    '''Принимает письма и ничего с ними не делает'''
+
+    def __init__(self) -> None:
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def connection_per_message(messages) -> None:
+    '''Прежнее поведение: новое соединение на каждое письмо'''
+    for message in messages:
+        with SMTP(host=HOST, port=PORT) as server:
+            server.send_message(message)
+
+
+def pooled(messages) -> None:
+    '''Отдельная задача на каждое письмо, соединение берется из пула'''
+    pool = SMTPPool(size=1, healthcheck_interval=30)
+    for message in messages:
+        pool.send([message])
+    pool.close()
+
+
+def batched(messages) -> None:
+    '''Одна задача на всю пачку'''
+    pool = SMTPPool(size=1, healthcheck_interval=30)
+    pool.send(messages)
+    pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=500)
+    args = parser.parse_args()
+
+    sink = Sink()
+    controller = Controller(sink, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        messages = [
+            build_message('Подтверждение регистрации', f'Код: {i}', f'user{i}@example.com')
+            for i in range(args.messages)
+        ]
+        for name, func in (
+            ('connection per message', connection_per_message),
+            ('pooled connection', pooled),
+            ('batched', batched),
+        ):
+            start = time.perf_counter()
+            func(messages)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<24} {len(messages) / elapsed:>8.1f} msg/s')
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
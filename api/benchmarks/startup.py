@@ -0,0 +1,133 @@
+'''Холодный старт: время импорта, запуска lifespan и первых запросов в новом процессе
+с прогревом ресурсов и без него.
+
+Каждый замер - отдельный процесс интерпретатора, зависимости заменены локальными
+(как в benchmarks.load). Результаты сохраняются в results/startup-<commit>.json.
+
+Запуск из каталога api: python -m benchmarks.startup --runs 5
+'''
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load import RESULTS_DIR, configure_environment, git_commit, use_fake_redis
+
+USERNAME, EMAIL, PASSWORD = 'coldstart', 'coldstart@example.com', 'coldstart-password'
+PHASES = ('import_s', 'startup_s', 'first_login_ms', 'second_login_ms', 'first_protected_ms')
+
+
+def prepare_database(workdir: str) -> None:
+    '''Схема и пользователь создаются заранее, чтобы не прогревать процесс замера'''
+    import bcrypt
+    from sqlalchemy import create_engine, insert
+
+    from database.models.base import Base
+    from database.models.user import User
+
+    engine = create_engine(f'sqlite:///{workdir}/bench.db')
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(
+            username=USERNAME,
+            email=EMAIL,
+            password=bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(12)).decode(),
+        ))
+    engine.dispose()
+
+
+async def measure_child(started: float) -> dict[str, float]:
+    '''Замер внутри нового процесса'''
+    import_start = time.perf_counter()
+    import main
+    result = {'import_s': time.perf_counter() - import_start}
+
+    startup_start = time.perf_counter()
+    lifespan = main.app.router.lifespan_context(main.app)
+    await lifespan.__aenter__()
+    result['startup_s'] = time.perf_counter() - startup_start
+    result['ready_s'] = time.perf_counter() - started
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        creds = {'username': USERNAME, 'email': EMAIL, 'password': PASSWORD}
+        for name in ('first_login_ms', 'second_login_ms'):
+            start = time.perf_counter()
+            response = await client.post('/api/auth/login', json=creds)
+            result[name] = (time.perf_counter() - start) * 1000
+            response.raise_for_status()
+
+        token = response.json()['data']['access_token']
+        start = time.perf_counter()
+        response = await client.get('/protected', headers={'Authorization': f'Bearer {token}'})
+        result['first_protected_ms'] = (time.perf_counter() - start) * 1000
+        response.raise_for_status()
+
+    await lifespan.__aexit__(None, None, None)
+    return result
+
+
+def run_child(workdir: str, warmup: bool) -> dict[str, float]:
+    command = [sys.executable, '-m', 'benchmarks.startup', '--child', workdir]
+    if not warmup:
+        command.append('--no-warmup')
+    start = time.perf_counter()
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_s'] = time.perf_counter() - start
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help='запусков на режим')
+    parser.add_argument('--output', type=Path, help='файл результатов (по умолчанию results/startup-<commit>.json)')
+    parser.add_argument('--child', metavar='WORKDIR', help=argparse.SUPPRESS)
+    parser.add_argument('--no-warmup', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        started = time.perf_counter()
+        configure_environment(
+            argparse.Namespace(email_transport='celery', rate_limit=False, redis='fake'), args.child
+        )
+        os.environ['WARMUP_ENABLED'] = str(not args.no_warmup).lower()
+        use_fake_redis()
+        print(json.dumps(asyncio.run(measure_child(started))))
+        return
+
+    report: dict = {'meta': {'commit': git_commit(), 'runs': args.runs}, 'modes': {}}
+    for mode, warmup in (('warmup', True), ('no_warmup', False)):
+        runs = []
+        for _ in range(args.runs):
+            workdir = tempfile.mkdtemp(prefix='quickstart-cold-')
+            prepare_database(workdir)
+            runs.append(run_child(workdir, warmup))
+        report['modes'][mode] = {
+            key: statistics.median(run[key] for run in runs)
+            for key in (*PHASES, 'ready_s', 'process_s')
+        }
+
+    print(f'{"median":<20} {"warmup":>10} {"no warmup":>10}')
+    for key in ('process_s', 'import_s', 'startup_s', 'ready_s', *PHASES[2:]):
+        print(
+            f'{key:<20} {report["modes"]["warmup"][key]:>10.3f} '
+            f'{report["modes"]["no_warmup"][key]:>10.3f}'
+        )
+
+    output = args.output or RESULTS_DIR / f'startup-{report["meta"]["commit"]}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f'results: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''Подбор стоимости хэша паролей под целевую задержку на текущей машине.
+
+Замеряет время хеширования при растущей стоимости и выбирает наибольшую, при которой
+медиана не превышает --target. Печатает настройки для .env; после их применения хэши
+пользователей пересчитываются в фоне при входе.
+
+bcrypt - подбирается число раундов. argon2 - time_cost при заданной памяти и
+параллелизме; если и time_cost=1 дольше цели, память уменьшается вдвое.
+
+Запуск из каталога api: python calibrate_password.py --target 0.25 --scheme argon2
+'''
+import argparse
+import statistics
+import sys
+import time
+
+from passlib.context import CryptContext
+
+from config import settings
+from services.password import build_context
+
+
+BCRYPT_ROUNDS = range(4, 32)
+ARGON2_MAX_TIME_COST = 64
+PASSWORD = 'calibration-password'
+
+
+def measure(context: CryptContext, samples: int) -> float:
+    '''Медиана времени одного хэша в секундах'''
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash(PASSWORD)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def report(cost: str, seconds: float) -> None:
+    print(f'  {cost:<28} {seconds * 1000:>9.1f} ms', file=sys.stderr, flush=True)
+
+
+def calibrate_bcrypt(target: float, samples: int) -> tuple[dict[str, int], float]:
+    chosen, chosen_seconds = None, 0.0
+    for rounds in BCRYPT_ROUNDS:
+        seconds = measure(build_context('bcrypt', rounds, 1, 8, 1), samples)
+        report(f'rounds={rounds}', seconds)
+        if seconds > target:
+            break
+        chosen, chosen_seconds = rounds, seconds
+    if chosen is None:
+        chosen, chosen_seconds = BCRYPT_ROUNDS[0], seconds
+    return {'PASSWORD_BCRYPT_ROUNDS': chosen}, chosen_seconds
+
+
+def calibrate_argon2(
+    target: float, samples: int, memory: int, parallelism: int
+) -> tuple[dict[str, int], float]:
+    while True:
+        chosen, chosen_seconds = None, 0.0
+        for time_cost in range(1, ARGON2_MAX_TIME_COST + 1):
+            seconds = measure(build_context('argon2', 4, time_cost, memory, parallelism), samples)
+            report(f'm={memory} KiB t={time_cost} p={parallelism}', seconds)
+            if seconds > target:
+                break
+            chosen, chosen_seconds = time_cost, seconds
+        # память argon2 - не меньше 8 KiB на поток
+        if chosen is not None or memory // 2 < 8 * parallelism:
+            break
+        memory //= 2
+    if chosen is None:
+        chosen, chosen_seconds = 1, seconds
+    values = {
+        'PASSWORD_ARGON2_TIME_COST': chosen,
+        'PASSWORD_ARGON2_MEMORY_COST': memory,
+        'PASSWORD_ARGON2_PARALLELISM': parallelism,
+    }
+    return values, chosen_seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', type=float, default=0.25, help='секунд на один хэш')
+    parser.add_argument('--scheme', choices=('bcrypt', 'argon2'), default=settings.PASSWORD_SCHEME)
+    parser.add_argument('--samples', type=int, default=5, help='замеров на каждую стоимость')
+    parser.add_argument('--memory', type=int, default=settings.PASSWORD_ARGON2_MEMORY_COST,
+                        help='память argon2, KiB')
+    parser.add_argument('--parallelism', type=int, default=settings.PASSWORD_ARGON2_PARALLELISM)
+    args = parser.parse_args()
+
+    print(f'{args.scheme}, цель {args.target * 1000:.0f} ms на хэш:', file=sys.stderr)
+    if args.scheme == 'bcrypt':
+        values, seconds = calibrate_bcrypt(args.target, args.samples)
+    else:
+        values, seconds = calibrate_argon2(args.target, args.samples, args.memory, args.parallelism)
+
+    if seconds > args.target:
+        print('минимальная стоимость дольше цели', file=sys.stderr)
+    # каждая проверка при входе занимает один воркер пула на время хэша
+    workers = settings.PASSWORD_HASHER_WORKERS
+    print(
+        f'итог: {seconds * 1000:.1f} ms на хэш, до {workers / seconds:.0f} входов/с '
+        f'при PASSWORD_HASHER_WORKERS={workers}',
+        file=sys.stderr,
+    )
+    print(f'PASSWORD_SCHEME={args.scheme}')
+    for name, value in values.items():
+        print(f'{name}={value}')
+
+
+if __name__ == '__main__':
+    main()
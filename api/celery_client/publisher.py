@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Literal
+
+from celery import Celery, Task
+
+from config import settings
+from exceptions.errors import ServiceOverloadedError
+from utils.metrics import CELERY_PUBLISH_DURATION
+from .tasks import celery_app, send_email, send_emails
+
+
+logger = logging.getLogger(__name__)
+
+OverflowPolicy = Literal['block', 'reject', 'drop_oldest']
+QueuedTask = tuple[Task, tuple[Any, ...], dict[str, Any]]
+
+
+class TaskPublisher:
+    '''Публикует задачи Celery в фоне, не блокируя event loop.
+
+    Задачи складываются в ограниченный буфер, фоновая корутина забирает их пачками
+    и отправляет в брокер из отдельного потока через одно соединение. Задачи из batches
+    (имя задачи -> задача, принимающая список их аргументов) внутри пачки объединяются
+    в один вызов пакетной задачи.
+    '''
+
+    def __init__(
+        self,
+        app: Celery,
+        maxsize: int,
+        batch_size: int,
+        overflow: OverflowPolicy,
+        batches: Mapping[str, Task] | None = None,
+        retries: int = 3,
+    ) -> None:
+        self.app = app
+        self.batches = batches or {}
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.retries = retries
+        self.published = 0
+        self.dropped = 0
+        self._queue: asyncio.Queue[QueuedTask] = asyncio.Queue(maxsize=maxsize)
+        self._worker: asyncio.Task | None = None
+        self._closed = False
+
+    @property
+    def buffered(self) -> int:
+        '''Количество задач, ожидающих публикации'''
+        return self._queue.qsize()
+
+    async def publish(self, task: Task, *args: Any, **kwargs: Any) -> None:
+        '''Ставит задачу в буфер публикации'''
+        if self._closed:
+            raise RuntimeError('Task publisher is closed')
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+        item = (task, args, kwargs)
+        if self.overflow == 'block':
+            await self._queue.put(item)
+            return
+
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow == 'reject':
+                raise ServiceOverloadedError('Task publisher buffer is full')
+            # drop_oldest: вытесняем самую старую задачу
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+            self._queue.put_nowait(item)
+
+    async def close(self, timeout: float) -> None:
+        '''Перестает принимать задачи и дожидается отправки буфера'''
+        self._closed = True
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error('Не удалось опубликовать задачи при остановке: %s', self._queue.qsize())
+        self._worker.cancel()
+        self._worker = None
+
+    async def _run(self) -> None:
+        '''Забирает задачи из буфера пачками и публикует их'''
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._publish_with_retries(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _publish_with_retries(self, batch: list[QueuedTask]) -> None:
+        for attempt in range(1, self.retries + 1):
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._publish_batch, batch)
+                CELERY_PUBLISH_DURATION.observe(time.perf_counter() - start)
+                self.published += len(batch)
+                return
+            except Exception as e:
+                logger.warning('Ошибка публикации задач (попытка %s): %s', attempt, e)
+                if attempt < self.retries:
+                    await asyncio.sleep(attempt)
+        self.dropped += len(batch)
+
+    def _publish_batch(self, batch: list[QueuedTask]) -> None:
+        '''Публикует пачку через одно соединение с брокером (блокирующий вызов)'''
+        with self.app.producer_or_acquire() as producer:
+            for task, args, kwargs in self._group(batch):
+                task.apply_async(args=args, kwargs=kwargs, producer=producer)
+
+    def _group(self, batch: list[QueuedTask]) -> list[QueuedTask]:
+        '''Заменяет несколько вызовов задачи из batches одним вызовом пакетной задачи'''
+        grouped: dict[Task, list[tuple[Any, ...]]] = {}
+        result = []
+        for task, args, kwargs in batch:
+            if task.name in self.batches and not kwargs:
+                grouped.setdefault(task, []).append(args)
+            else:
+                result.append((task, args, kwargs))
+        for task, calls in grouped.items():
+            if len(calls) == 1:
+                result.append((task, calls[0], {}))
+            else:
+                result.append((self.batches[task.name], (calls,), {}))
+        return result
+
+
+@lru_cache
+def get_task_publisher() -> TaskPublisher:
+    return TaskPublisher(
+        app=celery_app,
+        maxsize=settings.CELERY_PUBLISHER_BUFFER,
+        batch_size=settings.CELERY_PUBLISHER_BATCH,
+        overflow=settings.CELERY_PUBLISHER_OVERFLOW,
+        # письма, набравшиеся за пачку, уходят одной задачей через одно SMTP соединение
+        batches={send_email.name: send_emails},
+    )
@@ -0,0 +1,139 @@
+import queue
+import ssl
+import time
+from email.message import EmailMessage
+from functools import lru_cache
+from smtplib import SMTP, SMTPException, SMTPRecipientsRefused, SMTPResponseException, SMTPServerDisconnected
+
+import certifi
+
+from config import settings
+
+
+def build_message(subject: str, body: str, to_email: str) -> EmailMessage:
+    '''Собирает Email сообщение'''
+    email_message = EmailMessage()
+    email_message["From"] = settings.SMTP_USER
+    email_message["To"] = to_email
+    email_message["Subject"] = subject
+    email_message.set_content(body)
+    return email_message
+
+
+@lru_cache
+def get_ssl_context() -> ssl.SSLContext:
+    '''SSL контекст создается один раз на процесс'''
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class PooledSMTP:
+    '''Авторизованное SMTP соединение с отметкой времени последнего использования'''
+
+    def __init__(self, server: SMTP) -> None:
+        self.server = server
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        '''Проверяет соединение командой NOOP'''
+        try:
+            return self.server.noop()[0] == 250
+        except (SMTPException, OSError):
+            return False
+
+    def close(self) -> None:
+        try:
+            self.server.quit()
+        except (SMTPException, OSError):
+            self.server.close()
+
+
+class SMTPPool:
+    '''Пул постоянных SMTP соединений внутри процесса воркера'''
+
+    def __init__(self, size: int, healthcheck_interval: float) -> None:
+        self.size = size
+        self.healthcheck_interval = healthcheck_interval
+        self._idle: queue.LifoQueue[PooledSMTP] = queue.LifoQueue(maxsize=size)
+
+    def connect(self) -> PooledSMTP:
+        '''Открывает новое соединение: STARTTLS и авторизация'''
+        server = SMTP(host=settings.SMTP_HOST, port=settings.SMTP_PORT)
+        try:
+            if settings.SMTP_STARTTLS:
+                server.starttls(context=get_ssl_context())
+            if server.has_extn('auth'):
+                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except BaseException:
+            server.close()
+            raise
+        return PooledSMTP(server)
+
+    def acquire(self) -> PooledSMTP:
+        '''Берет живое соединение из пула или открывает новое'''
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+
+            idle_for = time.monotonic() - conn.last_used
+            if idle_for < self.healthcheck_interval or conn.is_alive():
+                return conn
+            conn.close()
+
+    def release(self, conn: PooledSMTP) -> None:
+        '''Возвращает соединение в пул, лишние закрывает'''
+        conn.last_used = time.monotonic()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def discard(self, conn: PooledSMTP) -> None:
+        '''Закрывает сломанное соединение'''
+        conn.close()
+
+    def send(self, messages: list[EmailMessage]) -> list[tuple[EmailMessage, Exception]]:
+        '''Отправляет сообщения через одно соединение, возвращает неотправленные с ошибками.
+
+        При обрыве соединения переподключается один раз и продолжает с того же сообщения.
+        '''
+        failed: list[tuple[EmailMessage, Exception]] = []
+        conn = self.acquire()
+        reconnected = False
+        index = 0
+        while index < len(messages):
+            try:
+                conn.server.send_message(messages[index])
+            except (SMTPServerDisconnected, OSError):
+                self.discard(conn)
+                if reconnected:
+                    raise
+                conn = self.connect()
+                reconnected = True
+                continue
+            except (SMTPRecipientsRefused, SMTPResponseException) as ex:
+                # сервер отклонил конкретное письмо, smtplib уже сбросил транзакцию (RSET)
+                failed.append((messages[index], ex))
+            except BaseException:
+                self.discard(conn)
+                raise
+            index += 1
+        self.release(conn)
+        return failed
+
+    def close(self) -> None:
+        '''Закрывает все простаивающие соединения'''
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+@lru_cache
+def get_smtp_pool() -> SMTPPool:
+    return SMTPPool(
+        size=settings.SMTP_POOL_SIZE,
+        healthcheck_interval=settings.SMTP_POOL_HEALTHCHECK_INTERVAL,
+    )
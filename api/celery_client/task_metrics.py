@@ -0,0 +1,79 @@
+'''Длительность задач Celery.
+
+Воркеры - отдельные процессы, поэтому гистограмма копится в Redis хэшах
+(по одному на задачу и итог), а API читает их при сборе /metrics.
+'''
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+from celery.signals import task_postrun, task_prerun
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from config import settings
+from utils.metrics import DEFAULT_BUCKETS, Histogram
+
+
+KEY_PREFIX = 'metrics:celery_task:'
+BUCKETS = DEFAULT_BUCKETS
+
+_started: dict[str, float] = {}
+
+
+@lru_cache
+def get_metrics_redis() -> Redis:
+    '''Синхронный клиент Redis для процесса воркера'''
+    return Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+    )
+
+
+@task_prerun.connect
+def task_started(task_id: str, **kwargs) -> None:
+    _started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def task_finished(task_id: str, task, state: str | None = None, **kwargs) -> None:
+    start = _started.pop(task_id, None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    key = f'{KEY_PREFIX}{task.name}:{state or "UNKNOWN"}'
+    try:
+        pipe = get_metrics_redis().pipeline(transaction=False)
+        pipe.hincrby(key, str(bisect_left(BUCKETS, elapsed)), 1)
+        pipe.hincrbyfloat(key, 'sum', elapsed)
+        pipe.execute()
+    except RedisError:
+        # метрики не должны ронять задачу
+        pass
+
+
+async def collect_task_durations(redis: AsyncRedis) -> Histogram:
+    '''Собирает гистограмму длительности задач из Redis'''
+    histogram = Histogram(
+        'celery_task_duration_seconds', 'Celery task execution time', ('task', 'state'), BUCKETS
+    )
+    keys = [key async for key in redis.scan_iter(match=f'{KEY_PREFIX}*', count=100)]
+    if not keys:
+        return histogram
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        values = await pipe.execute()
+
+    for key, fields in zip(keys, values):
+        task, _, state = key.removeprefix(KEY_PREFIX).rpartition(':')
+        series: list[float] = [int(fields.get(str(i), 0)) for i in range(len(BUCKETS) + 1)]
+        series.append(float(fields.get('sum', 0)))
+        histogram.load((task, state), series)
+    return histogram
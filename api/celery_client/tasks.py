@@ -1,11 +1,12 @@
-import ssl
-from email.message import EmailMessage
-
-import certifi
-from smtplib import SMTP
 from celery import Celery
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
 
 from config import settings
+from . import task_metrics  # noqa: F401 - подключает сигналы с длительностью задач
+from .smtp import build_message, get_smtp_pool
+
+logger = get_task_logger(__name__)
 
 celery_app = Celery('tasks', broker=settings.CELERY_BROKER_URL)
 
@@ -13,17 +14,23 @@ celery_app = Celery('tasks', broker=settings.CELERY_BROKER_URL)
 @celery_app.task
 def send_email(subject: str, body: str, to_email: str):
     '''Отправляет Email сообщение через SMTP'''
-    email_message = EmailMessage()
-    email_message["From"] = settings.SMTP_USER
-    email_message["To"] = to_email
-    email_message["Subject"] = subject
-    email_message.set_content(body)
+    send_emails([(subject, body, to_email)])
 
+
+@celery_app.task
+def send_emails(messages: list[tuple[str, str, str]]):
+    '''Отправляет пачку Email сообщений (subject, body, to_email) через одно SMTP соединение'''
     try:
-        with SMTP(host=settings.SMTP_HOST, port=settings.SMTP_PORT) as server:
-            context = ssl.create_default_context(cafile=certifi.where())
-            server.starttls(context=context)
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(email_message)
+        failed = get_smtp_pool().send([build_message(*message) for message in messages])
     except Exception as e:
-        print(f'Ошибка при отправке письма: {e}')
+        logger.exception('Ошибка при отправке письма: %s', e)
+        return
+
+    for email_message, e in failed:
+        logger.error('Ошибка при отправке письма на %s: %s', email_message['To'], e)
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    '''Закрывает SMTP соединения при остановке процесса воркера'''
+    get_smtp_pool().close()
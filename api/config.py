@@ -1,3 +1,6 @@
+import os
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -8,14 +11,162 @@ class Settings(BaseSettings):
     DEBUG: bool
     DATABASE_PROD_URL: str
     DATABASE_DEV_URL: str
+    # JSON список, например ["postgresql+asyncpg://replica1/db"]
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_REPLICA_STRATEGY: Literal['round_robin', 'least_loaded'] = 'round_robin'
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
     AUTH_SECRET_KEY: str
+    # ключи подписи JWT (ES256 или EdDSA): kid -> PEM закрытого ключа или путь к файлу;
+    # без ключей токены подписываются AUTH_SECRET_KEY (HS256)
+    JWT_KEYS: dict[str, str] = {}
+    # kid ключа подписи, по умолчанию последний в JWT_KEYS
+    JWT_SIGNING_KID: str | None = None
+    # принимать токены без kid, подписанные AUTH_SECRET_KEY (на время перехода)
+    JWT_ACCEPT_HS256: bool = True
+    JWKS_MAX_AGE: int = 300
     
     SMTP_HOST: str
     SMTP_PORT: int
     SMTP_USER: str
     SMTP_PASSWORD: str
+    SMTP_STARTTLS: bool = True
+    SMTP_POOL_SIZE: int = 2
+    SMTP_POOL_HEALTHCHECK_INTERVAL: float = 30
+
+    # celery - через воркер, smtp - прямо из процесса API (aiosmtplib)
+    EMAIL_TRANSPORT: Literal['celery', 'smtp'] = 'celery'
+    SMTP_MAX_PENDING: int = 1000
+    SMTP_RETRIES: int = 3
+    SMTP_RETRY_DELAY: float = 5
     
     CELERY_BROKER_URL: str
 
+    REDIS_HOST: str = 'redis'
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_PASSWORD: str | None = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_SOCKET_TIMEOUT: float = 2
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+
+    # коды подтверждения регистрации
+    VERIFY_CODE_TTL: int = 300
+    VERIFY_CODE_MAX_ATTEMPTS: int = 5
+
+    # лимиты запросов: маршрут -> {ip|username|email: "запросов/секунд"}
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOCAL_SIZE: int = 100_000
+    RATE_LIMITS: dict[str, dict[str, str]] = {
+        'login': {'ip': '30/60', 'username': '10/60', 'email': '10/60'},
+        'send_code': {'ip': '10/60', 'email': '3/300'},
+        'verify_code': {'ip': '30/60', 'email': '10/300'},
+    }
+    # адреса прокси, которым доверяются X-Forwarded-For/X-Forwarded-Proto (через запятую, '*' - любым).
+    # Лимиты по ip считаются по адресу клиента из X-Forwarded-For только за доверенным прокси,
+    # иначе - по адресу соединения: все клиенты за недоверенным прокси делят один лимит
+    FORWARDED_ALLOW_IPS: str = '127.0.0.1'
+
+    # контроль допуска: concurrency, max_queue, queue_timeout (с), deadline (с) на маршрут
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_DEFAULT: dict[str, float] = {
+        'concurrency': 200, 'max_queue': 500, 'queue_timeout': 1, 'deadline': 30,
+    }
+    ADMISSION_ROUTES: dict[str, dict[str, float]] = {
+        '/api/auth/login': {'concurrency': 32, 'max_queue': 64, 'queue_timeout': 0.5, 'deadline': 5},
+        '/api/auth/registration/send-code': {
+            'concurrency': 32, 'max_queue': 64, 'queue_timeout': 0.5, 'deadline': 5,
+        },
+        '/api/auth/registration/verify-code': {
+            'concurrency': 32, 'max_queue': 64, 'queue_timeout': 0.5, 'deadline': 5,
+        },
+        # один импорт на процесс, большие файлы - через import_users.py
+        '/admin/users/import': {
+            'concurrency': 1, 'max_queue': 1, 'queue_timeout': 0.1, 'deadline': 3600,
+        },
+        # каждая выгрузка держит соединение с БД, пока читает курсор
+        '/admin/users/export': {
+            'concurrency': 2, 'max_queue': 2, 'queue_timeout': 0.1, 'deadline': 3600,
+        },
+    }
+    # пробы и метрики не встают в очередь: под перегрузкой они должны отвечать сразу,
+    # а не получать 503 вместе с обычным трафиком
+    ADMISSION_EXEMPT: set[str] = {'/health/live', '/health/ready', '/metrics'}
+    CELERY_PUBLISHER_BUFFER: int = 1000
+    CELERY_PUBLISHER_BATCH: int = 100
+    CELERY_PUBLISHER_OVERFLOW: Literal['block', 'reject', 'drop_oldest'] = 'reject'
+
+    # хеширование паролей вне event loop
+    PASSWORD_HASHER_EXECUTOR: Literal['thread', 'process'] = 'thread'
+    PASSWORD_HASHER_WORKERS: int = os.cpu_count() or 1
+    PASSWORD_HASHER_MAX_QUEUE: int = 64
+    # схема и стоимость хэша, подбираются под целевую задержку: python calibrate_password.py;
+    # хэши с другой схемой или стоимостью пересчитываются в фоне при успешном входе
+    PASSWORD_SCHEME: Literal['bcrypt', 'argon2'] = 'bcrypt'
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 2
+    PASSWORD_ARGON2_MEMORY_COST: int = 19456  # KiB
+    PASSWORD_ARGON2_PARALLELISM: int = 1
+    PASSWORD_REHASH_MAX_PENDING: int = 100
+
+    # кэш проверенных токенов доступа
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_SIZE: int = 10_000
+    TOKEN_CACHE_TTL: int = 60
+
+    # кэш пользователей: LRU в процессе + Redis
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_LOCAL_SIZE: int = 10_000
+    USER_CACHE_LOCAL_TTL: float = 5
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_NEGATIVE_TTL: int = 5
+
+    # отзыв токенов: фильтр Блума в процессе, список в Redis; перестроение фильтра, с
+    REVOCATION_BLOOM_CAPACITY: int = 100_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_REBUILD_INTERVAL: float = 3600
+    # сколько секунд после потери связи с Redis отвечать по последнему фильтру; дальше - 503
+    REVOCATION_STALE_GRACE: float = 30
+
+    # массовый импорт пользователей: строк в транзакции, процессов bcrypt
+    USER_IMPORT_BATCH_SIZE: int = 1000
+    USER_IMPORT_HASH_WORKERS: int = os.cpu_count() or 1
+    # строк в пачке серверного курсора при выгрузке
+    USER_EXPORT_BATCH_SIZE: int = 1000
+
+    # объединение одновременных одинаковых чтений из БД и Redis
+    SINGLE_FLIGHT_TIMEOUT: float = 5
+
+    # многопроцессный запуск (server.py); 0 воркеров - по числу CPU
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_PRELOAD: bool = True
+    # перезапуск воркера после N запросов (0 - без перезапуска), jitter разносит перезапуски
+    SERVER_MAX_REQUESTS: int = 10_000
+    SERVER_MAX_REQUESTS_JITTER: int = 1_000
+
+    # прогрев при запуске и остановка
+    WARMUP_ENABLED: bool = True
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_REDIS_CONNECTIONS: int = 5
+    # остановка по SIGTERM укладывается в SHUTDOWN_GRACE_PERIOD (stop_grace_period контейнера):
+    # /health/ready сразу отвечает 503, через PRESTOP_DELAY воркер перестает принимать
+    # соединения и до DRAIN_TIMEOUT ждет запросов в работе, затем до CLOSE_TIMEOUT - буферов
+    SHUTDOWN_GRACE_PERIOD: float = 30
+    SHUTDOWN_PRESTOP_DELAY: float = 5
+    SHUTDOWN_DRAIN_TIMEOUT: float = 15
+    SHUTDOWN_CLOSE_TIMEOUT: float = 5
+
+    # метрики и профилирование
+    METRICS_ENABLED: bool = True
+    # пользователи с доступом к административным ручкам
+    ADMIN_USERNAMES: list[str] = []
+
 
 settings = Settings()  # type: ignore
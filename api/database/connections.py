@@ -1,16 +1,142 @@
+import itertools
+import time
 from functools import lru_cache
-from typing import Annotated, AsyncGenerator
+from typing import Annotated, Any, AsyncGenerator, Literal
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import Delete, Insert, Update, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from config import settings
+from utils.metrics import DB_QUERY_DURATION
+
+
+class PoolStats:
+    '''Счетчики ожидания соединения из пула'''
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def observe(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    '''Пул, измеряющий время ожидания свободного соединения'''
+
+    stats: PoolStats
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.observe(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> 'MeteredPool':
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+@lru_cache(maxsize=1024)
+def statement_label(statement: str) -> str:
+    '''Метка запроса для метрик: SQL без лишних пробелов (запросы параметризованы)'''
+    return ' '.join(statement.split())[:200]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # время хранится в контексте запроса: при ошибке after_cursor_execute не вызывается,
+    # и значение уходит вместе с контекстом, а не копится в соединении из пула
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = context._query_start
+    DB_QUERY_DURATION.observe(time.perf_counter() - start, statement_label(statement))
+
+
+def instrument_engine(engine: AsyncEngine) -> AsyncEngine:
+    '''Подключает замер времени каждого SQL запроса'''
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+    return engine
+
+
+def create_engine(url: str) -> AsyncEngine:
+    '''Создает движок с настройками пула из конфига'''
+    if make_url(url).database in (None, '', ':memory:'):
+        # in-memory SQLite живет в единственном соединении, пул не настраивается
+        return instrument_engine(create_async_engine(url, echo=settings.DEBUG))
+
+    engine = create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        poolclass=MeteredPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    engine.pool.stats = PoolStats()  # type: ignore[attr-defined]
+    return instrument_engine(engine)
+
+
+class ReplicaSet:
+    '''Выбор реплики для чтения: по кругу или наименее загруженная'''
+
+    def __init__(
+        self, engines: list[AsyncEngine], strategy: Literal['round_robin', 'least_loaded']
+    ) -> None:
+        self.engines = engines
+        self.strategy = strategy
+        self._cycle = itertools.cycle(engines)
+
+    def choose(self) -> AsyncEngine:
+        if self.strategy == 'least_loaded':
+            return min(self.engines, key=_checked_out)
+        return next(self._cycle)
+
+
+class RoutingSession(Session):
+    '''Отправляет чтения с read_only=True на реплику, все остальное - на основную БД'''
+
+    def get_bind(self, mapper=None, *, clause=None, read_only: bool = False, **kw: Any):
+        replicas: ReplicaSet | None = self.info.get('replicas')
+        is_write = self._flushing or isinstance(clause, (Insert, Update, Delete))
+        if replicas is None or not read_only or is_write:
+            return super().get_bind(mapper, clause=clause, **kw)
+
+        # одна реплика на сессию, чтобы не открывать несколько соединений
+        if 'replica' not in self.info:
+            self.info['replica'] = replicas.choose()
+        return self.info['replica'].sync_engine
 
 
 class DataBase:
-    def __init__(self, url: str) -> None:
+    def __init__(self, url: str, replica_urls: list[str] | None = None) -> None:
         self.url = url
-        self.engine = create_async_engine(self.url, echo=settings.DEBUG)
+        self.engine = create_engine(self.url)
+        self.replicas = [create_engine(replica_url) for replica_url in replica_urls or []]
+        replica_set = (
+            ReplicaSet(self.replicas, settings.DB_REPLICA_STRATEGY) if self.replicas else None
+        )
         self.session_factory = async_sessionmaker(
-            bind=self.engine, class_=AsyncSession, expire_on_commit=False
+            bind=self.engine,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            expire_on_commit=False,
+            info={'replicas': replica_set},
         )
 
     async def get_session(self) -> AsyncGenerator[AsyncSession]:
@@ -18,15 +144,43 @@ class DataBase:
         async with self.session_factory() as session:
             yield session
 
+    def pool_stats(self) -> dict[str, dict[str, float]]:
+        '''Состояние пулов основной БД и реплик'''
+        engines = {'primary': self.engine}
+        engines.update({f'replica_{i}': engine for i, engine in enumerate(self.replicas)})
+        result = {}
+        for name, engine in engines.items():
+            stats: PoolStats | None = getattr(engine.pool, 'stats', None)
+            if stats is None:
+                continue
+            result[name] = {
+                'checked_out': _checked_out(engine),
+                'checkouts': stats.checkouts,
+                'wait_total': stats.wait_total,
+                'wait_max': stats.wait_max,
+                'timeouts': stats.timeouts,
+            }
+        return result
+
+    async def dispose(self) -> None:
+        '''Закрывает все соединения'''
+        for engine in (self.engine, *self.replicas):
+            await engine.dispose()
+
+
+def _checked_out(engine: AsyncEngine) -> int:
+    checkedout = getattr(engine.pool, 'checkedout', None)
+    return checkedout() if checkedout is not None else 0
+
 
 class DevDatabase(DataBase):
     def __init__(self):
-        super().__init__(settings.DATABASE_DEV_URL)
+        super().__init__(settings.DATABASE_DEV_URL, settings.DATABASE_REPLICA_URLS)
 
 
 class ProdDatabase(DataBase):
     def __init__(self):
-        super().__init__(settings.DATABASE_PROD_URL)
+        super().__init__(settings.DATABASE_PROD_URL, settings.DATABASE_REPLICA_URLS)
 
 
 @lru_cache
@@ -34,7 +188,7 @@ def get_db_instance() -> DataBase:
     return DevDatabase() if settings.DEBUG else ProdDatabase()
 
 
-async def get_db(db_instance: DataBase = Depends(get_db_instance)) -> AsyncGenerator[AsyncSession]:    
+async def get_db(db_instance: DataBase = Depends(get_db_instance)) -> AsyncGenerator[AsyncSession]:
     async for session in db_instance.get_session():
         yield session
 
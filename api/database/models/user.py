@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String
+from sqlalchemy import Index, Integer, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
@@ -11,3 +11,7 @@ class User(Base):
     email: Mapped[str] = mapped_column(String, unique=True, nullable=False)
     password: Mapped[str] = mapped_column(String)
     username: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=True)
+
+
+# вход по email без учета регистра; запросы должны сравнивать ровно lower(email)
+Index('ix_users_email_lower', func.lower(User.email), unique=True)
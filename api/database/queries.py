@@ -1,42 +1,287 @@
-from typing import Annotated
+from typing import (
+    Annotated, Any, AsyncIterator, Awaitable, Callable, Literal, Sequence, TypeVar
+)
 
 from fastapi import Depends
-from sqlalchemy import or_, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    Insert, Row, bindparam, func, insert, literal_column, or_, select, update
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
 
-from database.connections import DBSessionsDep
+from database.connections import DBSessionsDep, get_db_instance
 from database.models.user import User
+from database.records import UserInsertResult, UserRecord
+from database.user_cache import MISSING, NOT_CACHED, UserCache, UserCacheDep
+from utils.single_flight import SingleFlight, SingleFlightDep
+
+
+T = TypeVar('T')
+
+# Core запросы для горячих путей: без ORM сущностей и identity map,
+# построены один раз, скомпилированная форма берется из кэша SQLAlchemy
+users = User.__table__
+USER_RECORD_COLUMNS = (users.c.id, users.c.username, users.c.email, users.c.password)
+# lower(email) совпадает с выражением индекса ix_users_email_lower, иначе индекс не используется
+EMAIL_LOWER = func.lower(users.c.email)
+USER_BY_USERNAME_QUERY = select(*USER_RECORD_COLUMNS).where(
+    users.c.username == bindparam('username')
+)
+USER_BY_EMAIL_QUERY = select(*USER_RECORD_COLUMNS).where(
+    EMAIL_LOWER == func.lower(bindparam('email'))
+)
+IMPORTED_USER_COLUMNS = (users.c.username, users.c.email)
+# список пользователей без хэшей паролей; keyset по первичному ключу (ix_users_id)
+USER_LIST_COLUMNS = (users.c.id, users.c.username, users.c.email)
+USER_PAGE_QUERY = select(*USER_LIST_COLUMNS).where(
+    users.c.id > bindparam('after_id')
+).order_by(users.c.id).limit(bindparam('limit'))
+USER_EXPORT_QUERY = select(*USER_LIST_COLUMNS).order_by(users.c.id)
+EXIST_USER_QUERY = select(literal_column('1')).where(
+    or_(
+        users.c.username == bindparam('username'),
+        EMAIL_LOWER == func.lower(bindparam('email'))
+    )
+).limit(1)
+# замена хэша пароля, только если в БД все еще прежний хэш
+PASSWORD_UPDATE_QUERY = update(users).where(
+    users.c.id == bindparam('user_id'), users.c.password == bindparam('old_password')
+).values(password=bindparam('new_password'))
 
 
 class QueriesService:
-    def __init__(self, db: AsyncSession) -> None:
+    def __init__(
+        self,
+        db: AsyncSession,
+        cache: UserCache | None = None,
+        flight: SingleFlight | None = None,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
         self.db = db
+        self.cache = cache
+        self.flight = flight
+        # сессии для общих запросов single flight, не привязанных к одному HTTP запросу
+        self.session_factory = session_factory
         
     async def is_exist_user(self, username: str, email: str) -> bool:
         '''Проверяет существует ли пользователь'''
-        query = select(User).where(
-            or_(
-                User.username == username,
-                User.email == email
-            )
+        if self.cache is not None:
+            keys = (self.cache.username_key(username), self.cache.email_key(email))
+            cached = [await self.cache.get(key) for key in keys]
+            if any(isinstance(value, UserRecord) for value in cached):
+                self.cache.query_saved()
+                return True
+            if all(value is MISSING for value in cached):
+                self.cache.query_saved()
+                return False
+
+        exists = await self._coalesce(
+            f'is_exist_user_{username}_{email}',
+            lambda conn: self._select_exist_user(conn, username, email),
         )
-        result = await self.db.execute(query)
-        return result.scalar_one_or_none() is not None
+
+        if self.cache is not None and not exists:
+            await self.cache.set_missing(*keys)
+        return exists
 
     async def add_new_user(self, user: User) -> None:
         '''Создает нового пользователя'''
         self.db.add(instance=user)
         await self.db.commit()
+        await self._invalidate(user.username, user.email)
+
+    async def insert_user(self, username: str, email: str, password: str) -> UserInsertResult:
+        '''Создает пользователя одним запросом INSERT ... ON CONFLICT DO NOTHING RETURNING id'''
+        values = {'username': username, 'email': email, 'password': password}
+        query = self._insert_ignore_conflicts()
+        if query is None:
+            return await self._insert_user_orm(values)
+
+        result = await self.db.execute(query.values(**values).returning(User.id))
+        user_id = result.scalar_one_or_none()
+        await self.db.commit()
+        if user_id is None:
+            return UserInsertResult(id=None, conflict=await self._find_conflict(username, email))
+
+        await self._invalidate(username, email)
+        return UserInsertResult(id=user_id)
         
-    async def get_user_by_username(self, username: str) -> User | None:
+    async def insert_users(self, rows: list[dict[str, str]]) -> int:
+        '''Вставляет пачку пользователей в одной транзакции, занятые username/email пропускает.
+
+        Один executemany: SQLAlchemy собирает из него многострочные INSERT ... ON CONFLICT
+        DO NOTHING RETURNING. Возвращает число вставленных строк.
+        '''
+        query = self._insert_ignore_conflicts(users)
+        if query is None:
+            inserted = await self._insert_users_one_by_one(rows)
+        else:
+            result = await self.db.execute(query.returning(*IMPORTED_USER_COLUMNS), rows)
+            inserted = [tuple(row) for row in result]
+        await self.db.commit()
+
+        if self.cache is not None:
+            await self.cache.invalidate_many(inserted)
+        return len(inserted)
+
+    async def update_password(self, user: UserRecord, password: str) -> bool:
+        '''Заменяет хэш пароля пользователя; False - пароль успели сменить, хэш не тот'''
+        result = await self.db.execute(
+            PASSWORD_UPDATE_QUERY,
+            {'user_id': user.id, 'old_password': user.password, 'new_password': password},
+        )
+        await self.db.commit()
+        if not result.rowcount:
+            return False
+        await self._invalidate(user.username, user.email)
+        return True
+
+    async def list_users(self, after_id: int, limit: int) -> list[Row]:
+        '''Страница пользователей с id больше after_id: стоимость не растет с номером страницы'''
+        conn = await self._read_connection()
+        result = await conn.execute(USER_PAGE_QUERY, {'after_id': after_id, 'limit': limit})
+        return list(result)
+
+    async def stream_users(self, batch_size: int) -> AsyncIterator[Sequence[Row]]:
+        '''Все пользователи пачками через серверный курсор, в памяти одна пачка'''
+        conn = await self._read_connection()
+        result = await conn.stream(USER_EXPORT_QUERY.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def get_user_by_username(self, username: str) -> UserRecord | None:
         '''Возвращает пользователя по username'''
-        query = select(User).where(User.username == username)
-        result = await self.db.execute(query)
-        return result.scalar_one_or_none()
+        if self.cache is not None:
+            cached = await self.cache.get(self.cache.username_key(username))
+            if cached is not NOT_CACHED:
+                self.cache.query_saved()
+                return cached if isinstance(cached, UserRecord) else None
+
+        record = await self._coalesce(
+            f'user_username_{username}', lambda conn: self._select_user_by_username(conn, username)
+        )
+
+        if self.cache is not None:
+            if record is None:
+                await self.cache.set_missing(self.cache.username_key(username))
+            else:
+                await self.cache.set_user(record)
+        return record
+
+    async def get_user_by_email(self, email: str) -> UserRecord | None:
+        '''Возвращает пользователя по email без учета регистра'''
+        if self.cache is not None:
+            cached = await self.cache.get(self.cache.email_key(email))
+            if cached is not NOT_CACHED:
+                self.cache.query_saved()
+                return cached if isinstance(cached, UserRecord) else None
+
+        record = await self._coalesce(
+            f'user_email_{email.lower()}', lambda conn: self._select_user_by_email(conn, email)
+        )
+
+        if self.cache is not None:
+            if record is None:
+                await self.cache.set_missing(self.cache.email_key(email))
+            else:
+                await self.cache.set_user(record)
+        return record
+
+    @staticmethod
+    async def _select_exist_user(conn: AsyncConnection, username: str, email: str) -> bool:
+        result = await conn.execute(EXIST_USER_QUERY, {'username': username, 'email': email})
+        return result.scalar() is not None
+
+    @staticmethod
+    async def _select_user_by_username(conn: AsyncConnection, username: str) -> UserRecord | None:
+        result = await conn.execute(USER_BY_USERNAME_QUERY, {'username': username})
+        row = result.one_or_none()
+        return None if row is None else UserRecord(*row)
+
+    @staticmethod
+    async def _select_user_by_email(conn: AsyncConnection, email: str) -> UserRecord | None:
+        result = await conn.execute(USER_BY_EMAIL_QUERY, {'email': email})
+        row = result.one_or_none()
+        return None if row is None else UserRecord(*row)
+
+    async def _read_connection(self) -> AsyncConnection:
+        '''Соединение для чтений, допускающих отставание: реплика, если они настроены'''
+        return await self.db.connection(bind_arguments={'read_only': True})
+
+    def _insert_ignore_conflicts(self, target: Any = User) -> Insert | None:
+        '''INSERT ... ON CONFLICT DO NOTHING для поддерживаемых диалектов'''
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return postgresql.insert(target).on_conflict_do_nothing()
+        if dialect == 'sqlite':
+            return sqlite.insert(target).on_conflict_do_nothing()
+        return None
+
+    async def _insert_users_one_by_one(self, rows: list[dict[str, str]]) -> list[tuple[str, str]]:
+        '''Пачка для диалектов без ON CONFLICT: конфликт откатывает только свою строку'''
+        inserted = []
+        for row in rows:
+            try:
+                async with self.db.begin_nested():
+                    await self.db.execute(insert(users).values(**row))
+            except IntegrityError:
+                continue
+            inserted.append((row['username'], row['email']))
+        return inserted
+
+    async def _insert_user_orm(self, values: dict[str, str]) -> UserInsertResult:
+        '''Вставка для диалектов без ON CONFLICT'''
+        try:
+            result = await self.db.execute(insert(User).values(**values).returning(User.id))
+            user_id = result.scalar_one()
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            conflict = await self._find_conflict(values['username'], values['email'])
+            return UserInsertResult(id=None, conflict=conflict)
+
+        await self._invalidate(values['username'], values['email'])
+        return UserInsertResult(id=user_id)
+
+    async def _find_conflict(self, username: str, email: str) -> Literal['username', 'email'] | None:
+        '''Определяет, какое уникальное поле уже занято (только после неудачной вставки)'''
+        query = select(User.username).where(
+            or_(User.username == username, EMAIL_LOWER == func.lower(email))
+        ).limit(1)
+        existing = (await self.db.execute(query)).scalar()
+        if existing is None:
+            return None
+        return 'username' if existing == username else 'email'
+
+    async def _coalesce(self, key: str, read: Callable[[AsyncConnection], Awaitable[T]]) -> T:
+        '''Одновременные одинаковые чтения выполняются одним запросом.
+
+        Общий запрос идет в собственной короткой сессии: сессию HTTP запроса, который его
+        начал, закроют при таймауте или отключении клиента, а остальные продолжат ждать.
+        Это поиски для входа и регистрации, они читают основную БД: на отстающей реплике
+        только что созданного пользователя нет, и этот промах попал бы в кэш.
+        '''
+        if self.flight is None or self.session_factory is None:
+            return await read(await self.db.connection())
+        return await self.flight.do(key, lambda: self._in_own_session(read))
+
+    async def _in_own_session(self, read: Callable[[AsyncConnection], Awaitable[T]]) -> T:
+        async with self.session_factory() as session:
+            return await read(await session.connection())
+
+    async def _invalidate(self, username: str | None, email: str | None) -> None:
+        '''Сбрасывает кэш пользователя, вызывать после каждой записи в users'''
+        if self.cache is not None:
+            await self.cache.invalidate(username, email)
             
     
-def get_queries_service(db: DBSessionsDep) -> QueriesService:
-    return QueriesService(db=db)
+def get_queries_service(
+    db: DBSessionsDep, cache: UserCacheDep, flight: SingleFlightDep
+) -> QueriesService:
+    return QueriesService(
+        db=db, cache=cache, flight=flight, session_factory=get_db_instance().session_factory
+    )
 
 
 QueriesServiceDep = Annotated[QueriesService, Depends(get_queries_service)]
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from typing import Literal
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    '''Компактная проекция пользователя для горячих путей авторизации'''
+    id: int
+    username: str
+    email: str
+    password: str
+
+
+@dataclass(frozen=True, slots=True)
+class UserInsertResult:
+    '''Результат вставки пользователя: id новой строки или поле, по которому был конфликт'''
+    id: int | None
+    conflict: Literal['username', 'email'] | None = None
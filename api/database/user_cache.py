@@ -0,0 +1,168 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Annotated, Iterable
+
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from config import settings
+from database.records import UserRecord
+from redis_client.redis import get_redis
+
+
+# отличает закэшированное "пользователя нет" от отсутствия записи в кэше
+MISSING = object()
+NOT_CACHED = object()
+
+
+class UserCache:
+    '''Двухуровневый кэш пользователей: LRU в процессе и Redis.
+
+    Хранит проекцию UserRecord по username и по email, отсутствие пользователя
+    кэшируется с коротким TTL.
+    '''
+
+    def __init__(
+        self, redis: Redis, local_size: int, local_ttl: float, ttl: int, negative_ttl: int
+    ) -> None:
+        self.redis = redis
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        # ответы, отданные без запроса в БД; попадание не всегда его экономит
+        self.queries_saved = 0
+        self._local: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    @staticmethod
+    def username_key(username: str) -> str:
+        return f'user_username_{username}'
+
+    @staticmethod
+    def email_key(email: str) -> str:
+        # email сравнивается без учета регистра
+        return f'user_email_{email.lower()}'
+
+    async def get(self, key: str) -> object:
+        '''Возвращает UserRecord, MISSING или NOT_CACHED'''
+        item = self._local.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at > time.monotonic():
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return value
+            del self._local[key]
+
+        try:
+            raw = await self.redis.get(key)
+        except RedisError:
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return NOT_CACHED
+
+        data = json.loads(raw)
+        value = MISSING if data is None else UserRecord(**data)
+        self._set_local(key, value)
+        self.redis_hits += 1
+        return value
+
+    async def set_user(self, user: UserRecord) -> None:
+        '''Кэширует пользователя по username и email'''
+        raw = json.dumps(asdict(user))
+        keys = (self.username_key(user.username), self.email_key(user.email))
+        for key in keys:
+            self._set_local(key, user)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, raw, ex=self.ttl)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    async def set_missing(self, *keys: str) -> None:
+        '''Кэширует отсутствие пользователя с коротким TTL'''
+        for key in keys:
+            self._set_local(key, MISSING, ttl=min(self.local_ttl, self.negative_ttl))
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, 'null', ex=self.negative_ttl)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    async def invalidate(self, username: str | None, email: str | None) -> None:
+        '''Удаляет записи пользователя, вызывается при любом изменении users'''
+        keys = []
+        if username is not None:
+            keys.append(self.username_key(username))
+        if email is not None:
+            keys.append(self.email_key(email))
+        await self._delete(keys)
+
+    async def invalidate_many(self, users: Iterable[tuple[str, str]]) -> None:
+        '''Удаляет записи пачки пользователей (username, email) одной командой'''
+        keys = []
+        for username, email in users:
+            keys.extend((self.username_key(username), self.email_key(email)))
+        await self._delete(keys)
+
+    def query_saved(self) -> None:
+        '''Отмечает ответ, полностью полученный из кэша'''
+        self.queries_saved += 1
+
+    def stats(self) -> dict[str, float]:
+        '''Счетчики попаданий и сэкономленных запросов в БД'''
+        hits = self.local_hits + self.redis_hits
+        total = hits + self.misses
+        return {
+            'size': len(self._local),
+            'local_hits': self.local_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'db_queries_saved': self.queries_saved,
+        }
+
+    async def _delete(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        for key in keys:
+            self._local.pop(key, None)
+        try:
+            await self.redis.delete(*keys)
+        except RedisError:
+            pass
+
+    def _set_local(self, key: str, value: object, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.local_ttl if ttl is None else ttl)
+        self._local[key] = (expires_at, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+
+@lru_cache
+def get_user_cache() -> UserCache | None:
+    if not settings.USER_CACHE_ENABLED:
+        return None
+    return UserCache(
+        redis=get_redis(),
+        local_size=settings.USER_CACHE_LOCAL_SIZE,
+        local_ttl=settings.USER_CACHE_LOCAL_TTL,
+        ttl=settings.USER_CACHE_TTL,
+        negative_ttl=settings.USER_CACHE_NEGATIVE_TTL,
+    )
+
+
+UserCacheDep = Annotated[UserCache | None, Depends(get_user_cache)]
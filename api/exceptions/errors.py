@@ -0,0 +1,14 @@
+class ForbiddenError(Exception):
+    '''Недостаточно прав для выполнения запроса'''
+
+
+class ServiceOverloadedError(Exception):
+    '''Сервис перегружен, запрос отклоняется без ожидания'''
+
+
+class RateLimitExceededError(Exception):
+    '''Превышен лимит запросов'''
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f'Rate limit exceeded, retry after {retry_after:.0f}s')
+        self.retry_after = retry_after
@@ -1,12 +1,26 @@
+import math
+
 from fastapi import Request
-from fastapi.responses import JSONResponse
 
-from schemes.responses import ApiResponse
+from schemes.responses import PreparedResponse
+
+
+SERVER_ERROR = PreparedResponse(500, 'Server error')
+SERVICE_OVERLOADED = PreparedResponse(503, 'Service overloaded', headers={'Retry-After': '1'})
+TOO_MANY_REQUESTS = PreparedResponse(429, 'Too many requests')
 
 
 async def server_error(request: Request, exc: Exception):
-    '''Перехватывает все ошибки'''    
-    return JSONResponse(
-        status_code=500,
-        content=ApiResponse(result='error', message='Server error').model_dump()
-    )
+    '''Перехватывает все ошибки'''
+    return SERVER_ERROR()
+
+
+async def service_overloaded(request: Request, exc: Exception):
+    '''Перехватывает ошибку перегрузки сервиса'''
+    return SERVICE_OVERLOADED()
+
+
+async def rate_limit_exceeded(request: Request, exc: Exception):
+    '''Перехватывает ошибку превышения лимита запросов'''
+    retry_after = math.ceil(getattr(exc, 'retry_after', 1))
+    return TOO_MANY_REQUESTS(headers={'Retry-After': str(retry_after)})
@@ -1,19 +1,29 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
 
-from schemes.responses import ApiResponse
+from schemes.responses import PreparedResponse
+
+
+INVALID_TOKEN = PreparedResponse(401, 'Invalid token')
+TOKEN_NOT_FOUND = PreparedResponse(401, 'Token not found')
+TOKEN_REVOKED = PreparedResponse(401, 'Token has been revoked')
+FORBIDDEN = PreparedResponse(403, 'Forbidden')
 
 
 async def invalid_token(request: Request, exc: Exception):
     '''Перехватывает ошибку с невалидным токеном'''
-    return JSONResponse(
-        status_code=401, content=ApiResponse(result='error', message='Invalid token').model_dump()
-    )
+    return INVALID_TOKEN()
 
 
 async def token_not_found(request: Request, exc: Exception):
     '''Перехватывает ошибку когда токен не найден'''
-    return JSONResponse(
-        status_code=401,
-        content=ApiResponse(result='error', message='Token not found').model_dump(),
-    )
+    return TOKEN_NOT_FOUND()
+
+
+async def revoked_token(request: Request, exc: Exception):
+    '''Перехватывает ошибку отозванного токена'''
+    return TOKEN_REVOKED()
+
+
+async def forbidden(request: Request, exc: Exception):
+    '''Перехватывает ошибку недостаточных прав'''
+    return FORBIDDEN()
@@ -0,0 +1,82 @@
+'''Массовый импорт пользователей из CSV или NDJSON файла.
+
+Прогресс сохраняется в <файл>.checkpoint после каждой пачки; повторный запуск с тем же
+файлом продолжает с последней записанной строки (--restart - начать заново).
+
+Запуск из каталога api: python import_users.py users.csv --workers 8
+'''
+import argparse
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from config import settings
+from database.connections import get_db_instance
+from database.user_cache import get_user_cache
+from redis_client.redis import get_redis
+from services.user_import import (
+    FileCheckpoint, ImportProgress, UserImporter, iter_lines, read_file, read_rows
+)
+
+
+def print_progress(progress: ImportProgress) -> None:
+    print(
+        f'\rстрока {progress.line}: добавлено {progress.inserted}, пропущено {progress.skipped}, '
+        f'ошибок {progress.invalid}, {progress.rate:.0f} строк/с',
+        end='',
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+async def run(args: argparse.Namespace) -> ImportProgress:
+    checkpoint = FileCheckpoint(args.checkpoint)
+    progress = None if args.restart else checkpoint.load()
+    if progress is not None:
+        print(f'продолжение со строки {progress.line}', file=sys.stderr)
+
+    db = get_db_instance()
+    try:
+        with ProcessPoolExecutor(args.workers) as executor:
+            importer = UserImporter(
+                session_factory=db.session_factory,
+                cache=get_user_cache(),
+                executor=executor,
+                hash_workers=args.workers,
+                batch_size=args.batch_size,
+                checkpoint=checkpoint,
+                on_progress=print_progress,
+            )
+            rows = read_rows(iter_lines(read_file(args.file)), args.format)
+            return await importer.run(rows, progress)
+    finally:
+        print(file=sys.stderr)
+        await get_redis().aclose()
+        await db.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', type=Path)
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='по умолчанию по расширению')
+    parser.add_argument('--batch-size', type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=settings.USER_IMPORT_HASH_WORKERS,
+                        help='процессов bcrypt')
+    parser.add_argument('--checkpoint', type=Path, help='по умолчанию <file>.checkpoint')
+    parser.add_argument('--restart', action='store_true', help='игнорировать checkpoint')
+    args = parser.parse_args()
+    args.format = args.format or ('csv' if args.file.suffix.lower() == '.csv' else 'ndjson')
+    args.checkpoint = args.checkpoint or args.file.with_name(args.file.name + '.checkpoint')
+
+    progress = asyncio.run(run(args))
+    print(
+        f'готово: добавлено {progress.inserted}, пропущено {progress.skipped}, '
+        f'ошибок {progress.invalid} за {progress.elapsed:.1f} с'
+    )
+    for error in progress.errors:
+        print(f'  {error}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,55 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from authx.exceptions import MissingTokenError, JWTDecodeError
+from authx.exceptions import MissingTokenError, JWTDecodeError, RevokedTokenError
 
-from exceptions.handlers.auth import token_not_found, invalid_token
-from exceptions.handlers.api import server_error
+from exceptions.handlers.auth import forbidden, revoked_token, token_not_found, invalid_token
+from exceptions.errors import ForbiddenError, RateLimitExceededError, ServiceOverloadedError
+from exceptions.handlers.api import rate_limit_exceeded, server_error, service_overloaded
 from authorization.authx import TokenPayloadDep
 from routers.auth import router as auth_router
+from routers.health import router as health_router
+from routers.jwks import router as jwks_router
+from routers.metrics import router as metrics_router
+from routers.users import router as users_router
+from schemes.responses import ModelResponse
+from middlewares.admission import AdmissionControlMiddleware
+from middlewares.metrics import MetricsMiddleware
+from utils.lifecycle import get_lifecycle
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ресурсы создаются и прогреваются до приема трафика, /health/ready отвечает после
+    lifecycle = get_lifecycle()
+    await lifecycle.startup()
+    yield
+    # запросы в работе дождался uvicorn; дожидаемся писем и задач в буфере, закрываем пулы
+    await lifecycle.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ModelResponse)
 
 # обработчики ошибок
 app.add_exception_handler(JWTDecodeError, invalid_token)
 app.add_exception_handler(MissingTokenError, token_not_found)
+app.add_exception_handler(RevokedTokenError, revoked_token)
+app.add_exception_handler(ForbiddenError, forbidden)
+app.add_exception_handler(ServiceOverloadedError, service_overloaded)
+app.add_exception_handler(RateLimitExceededError, rate_limit_exceeded)
 app.add_exception_handler(Exception, server_error)
 
+# middleware
+app.add_middleware(AdmissionControlMiddleware)
+# внешние слои добавляются последними: метрики учитывают и отказы admission control
+app.add_middleware(MetricsMiddleware)
+
 # роуты
 app.include_router(prefix='/api', router=auth_router)
+app.include_router(metrics_router)
+app.include_router(users_router)
+app.include_router(health_router)
+app.include_router(jwks_router)
 
 
 @app.get('/protected')
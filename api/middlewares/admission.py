@@ -0,0 +1,177 @@
+import asyncio
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from exceptions.errors import ServiceOverloadedError
+from exceptions.handlers.api import service_overloaded
+from utils.metrics import registry, samples_from_stats
+
+
+@dataclass(slots=True)
+class RouteLimit:
+    concurrency: int
+    max_queue: int
+    queue_timeout: float
+    deadline: float
+
+    def __post_init__(self) -> None:
+        self.concurrency = int(self.concurrency)
+        self.max_queue = int(self.max_queue)
+
+
+class RouteGate:
+    '''Ограничение одновременных запросов маршрута и статистика очереди'''
+
+    def __init__(self, limit: RouteLimit) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.deadline_exceeded = 0
+        self.disconnected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._semaphore = asyncio.Semaphore(limit.concurrency)
+
+    async def acquire(self) -> float:
+        '''Ждет свободный слот не дольше queue_timeout, возвращает время ожидания'''
+        if self.queued >= self.limit.max_queue:
+            self.shed += 1
+            raise ServiceOverloadedError('Route queue is full')
+
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.limit.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            raise ServiceOverloadedError('Request could not start within its budget')
+        finally:
+            self.queued -= 1
+
+        waited = time.perf_counter() - start
+        self.in_flight += 1
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'admitted': self.admitted,
+            'shed': self.shed,
+            'deadline_exceeded': self.deadline_exceeded,
+            'disconnected': self.disconnected,
+            'wait_total': self.wait_total,
+            'wait_max': self.wait_max,
+        }
+
+
+class AdmissionControlMiddleware:
+    '''ASGI middleware: лимит конкурентности и дедлайн на маршрут, быстрый 503 при перегрузке.
+
+    Запрос, не получивший слот за queue_timeout, сразу получает 503; обработка,
+    не уложившаяся в deadline, или запрос, клиент которого отключился, отменяются.
+    '''
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.gates = {
+            path: RouteGate(RouteLimit(**limit)) for path, limit in settings.ADMISSION_ROUTES.items()
+        }
+        self.default_gate = RouteGate(RouteLimit(**settings.ADMISSION_DEFAULT))
+        registry.collector(lambda: samples_from_stats('admission', self.stats(), label='route'))
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        result = {path: gate.stats() for path, gate in self.gates.items()}
+        result['*'] = self.default_gate.stats()
+        return result
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope['type'] != 'http'
+            or not settings.ADMISSION_ENABLED
+            or scope['path'] in settings.ADMISSION_EXEMPT
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.gates.get(scope['path'], self.default_gate)
+        try:
+            waited = await gate.acquire()
+        except ServiceOverloadedError as exc:
+            response = await service_overloaded(Request(scope), exc)
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self._run(gate, scope, receive, send, gate.limit.deadline - waited)
+        finally:
+            gate.release()
+
+    async def _run(
+        self, gate: RouteGate, scope: Scope, receive: Receive, send: Send, budget: float
+    ) -> None:
+        # receive читается отдельной задачей, чтобы заметить отключение клиента;
+        # очередь размером 1 сохраняет backpressure при чтении тела
+        messages: asyncio.Queue[Message] = asyncio.Queue(maxsize=1)
+        response_started = False
+        client_gone = False
+
+        async def wrapped_receive() -> Message:
+            return await messages.get()
+
+        async def wrapped_send(message: Message) -> None:
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        app_task = asyncio.create_task(self.app(scope, wrapped_receive, wrapped_send))
+
+        async def watch_disconnect() -> None:
+            nonlocal client_gone
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    if not app_task.done():
+                        client_gone = True
+                        gate.disconnected += 1
+                        app_task.cancel()
+                    return
+                await messages.put(message)
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            async with asyncio.timeout(budget):
+                await app_task
+        except TimeoutError:
+            gate.deadline_exceeded += 1
+            if not response_started:
+                response = await service_overloaded(
+                    Request(scope), ServiceOverloadedError('Request deadline exceeded')
+                )
+                await response(scope, receive, send)
+        except asyncio.CancelledError:
+            # отменили из-за отключения клиента - отвечать некому
+            if not client_gone:
+                raise
+        finally:
+            watcher.cancel()
+            # слот освобождается, только когда обработчик действительно завершился
+            if not app_task.done():
+                app_task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await app_task
@@ -0,0 +1,39 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from utils.metrics import HTTP_REQUEST_DURATION
+
+
+class MetricsMiddleware:
+    '''ASGI middleware: гистограмма задержки по методу, шаблону маршрута и статусу'''
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def wrapped_send(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            # шаблон пути (а не сам путь) ограничивает число рядов метрики
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope['method'],
+                getattr(route, 'path', 'unmatched'),
+                str(status),
+            )
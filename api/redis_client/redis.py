@@ -1,12 +1,73 @@
+import time
 from functools import lru_cache
-from typing import Annotated
+from typing import Annotated, Any
 from fastapi import Depends
-from redis.asyncio import Redis
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
+from config import settings
+from utils.metrics import REDIS_COMMAND_DURATION, REDIS_COMMAND_ERRORS
+
+
+class InstrumentedPipeline(Pipeline):
+    '''Pipeline, измеряющий время выполнения пачки команд'''
+
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        name = 'MULTI' if self.is_transaction else 'PIPELINE'
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            REDIS_COMMAND_ERRORS.inc(name)
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, name)
+
+
+class InstrumentedRedis(Redis):
+    '''Клиент Redis с метриками задержки команд и статистикой пула'''
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        name = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            REDIS_COMMAND_ERRORS.inc(name)
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, name)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+    def stats(self) -> dict[str, int]:
+        '''Состояние пула соединений'''
+        pool = self.connection_pool
+        return {
+            'max_connections': pool.max_connections,
+            'in_use': len(getattr(pool, '_in_use_connections', ())),
+            'idle': len(getattr(pool, '_available_connections', ())),
+        }
 
 
 @lru_cache
-def get_redis():
-    return Redis(host="redis", port=6379, decode_responses=True)
+def get_redis() -> InstrumentedRedis:
+    pool = BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
+    )
+    return InstrumentedRedis(connection_pool=pool)
 
 
 RedisDep = Annotated[Redis, Depends(get_redis)]
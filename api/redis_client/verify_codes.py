@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Depends
+from redis.asyncio import Redis
+
+from config import settings
+from .redis import get_redis
+
+
+# Сверяет код и при совпадении атомарно забирает данные регистрации (повторно код не сработает).
+# Неверные попытки считаются, после max_attempts код сгорает.
+VERIFY_SCRIPT = '''
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+    return false
+end
+if code == ARGV[1] then
+    local payload = redis.call('HGET', KEYS[1], 'payload')
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return payload
+end
+local attempts = redis.call('INCR', KEYS[2])
+if attempts == 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+if attempts >= tonumber(ARGV[3]) then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return false
+'''
+
+
+class VerifyCodeStore:
+    '''Хранилище кодов подтверждения регистрации в Redis'''
+
+    def __init__(self, redis: Redis, ttl: int, max_attempts: int) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self._verify = redis.register_script(VERIFY_SCRIPT)
+
+    @staticmethod
+    def keys(email: str) -> tuple[str, str]:
+        # hash tag {email} держит оба ключа в одном слоте Redis Cluster
+        return f'verify_code:{{{email}}}', f'verify_attempts:{{{email}}}'
+
+    async def save(self, email: str, code: int, payload: str) -> None:
+        '''Сохраняет код и данные регистрации, сбрасывает счетчик попыток (один round trip)'''
+        code_key, attempts_key = self.keys(email)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(code_key, attempts_key)
+            pipe.hset(code_key, mapping={'code': str(code), 'payload': payload})
+            pipe.expire(code_key, self.ttl)
+            await pipe.execute()
+
+    async def pop(self, email: str, code: int) -> str | None:
+        '''Возвращает данные регистрации, если код верный, и удаляет их'''
+        payload = await self._verify(
+            keys=list(self.keys(email)), args=[str(code), self.ttl, self.max_attempts]
+        )
+        return payload or None
+
+
+@lru_cache
+def get_verify_code_store() -> VerifyCodeStore:
+    return VerifyCodeStore(
+        redis=get_redis(),
+        ttl=settings.VERIFY_CODE_TTL,
+        max_attempts=settings.VERIFY_CODE_MAX_ATTEMPTS,
+    )
+
+
+VerifyCodeStoreDep = Annotated[VerifyCodeStore, Depends(get_verify_code_store)]
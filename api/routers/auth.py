@@ -1,32 +1,51 @@
-from fastapi import Request, APIRouter
+from fastapi import Depends, Request, APIRouter
 
-from schemes.responses import ApiResponse
-from schemes.auth import RefreshForm, SendCodeRequest, VerifyCodeRequest
+from authorization.authx import TokenPayloadDep
+from schemes.responses import ApiResponse, ConflictResponse, TokensResponse
+from schemes.auth import LoginRequest, RefreshForm, SendCodeRequest, VerifyCodeRequest
 from services.auth import AuthServiceDep
+from utils.rate_limit import RateLimit
 
 
 router = APIRouter(prefix='/auth')
 
 
-@router.post('/registration/send-code', response_model=ApiResponse)
+@router.post(
+    '/registration/send-code',
+    response_model=ApiResponse,
+    dependencies=[Depends(RateLimit('send_code'))],
+)
 async def send_code(creds: SendCodeRequest, auth_service: AuthServiceDep):
     '''Отправляет код верификации пользователю'''
     return await auth_service.send_verify_code(creds)
 
 
-@router.post('/registration/verify-code', response_model=ApiResponse)
+@router.post(
+    '/registration/verify-code',
+    response_model=ApiResponse,
+    responses={409: {'model': ConflictResponse}},
+    dependencies=[Depends(RateLimit('verify_code'))],
+)
 async def verify_code(verify: VerifyCodeRequest, auth_service: AuthServiceDep):
     '''Проверяет код верификации пользователя'''
     return await auth_service.verify_code(verify)
 
 
-@router.post('/login', response_model=ApiResponse)
-async def login(creds: SendCodeRequest, auth_service: AuthServiceDep):
-    '''Авторизация в сервисе с помощью username и password'''
+@router.post(
+    '/login', response_model=TokensResponse, dependencies=[Depends(RateLimit('login'))]
+)
+async def login(creds: LoginRequest, auth_service: AuthServiceDep):
+    '''Авторизация в сервисе с помощью email или username и password'''
     return await auth_service.login_user(creds)
 
 
-@router.post('/refresh', response_model=ApiResponse)
+@router.post('/refresh', response_model=TokensResponse)
 async def refresh(request: Request, refresh_data: RefreshForm, auth_service: AuthServiceDep):
     '''Принимает рефреш токен и на его основе выдает новый токен доступа'''
     return await auth_service.refresh_token(request, refresh_data)
+
+
+@router.post('/logout', response_model=ApiResponse)
+async def logout(payload: TokenPayloadDep, auth_service: AuthServiceDep):
+    '''Отзывает токены текущего входа во всех воркерах'''
+    return await auth_service.logout(payload)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+
+from schemes.responses import ApiResponse, PreparedResponse
+from utils.lifecycle import get_lifecycle
+
+
+router = APIRouter(prefix='/health', tags=['health'])
+
+NOT_READY = PreparedResponse(503, 'Not ready')
+DRAINING = PreparedResponse(503, 'Draining')
+
+
+@router.get('/live', response_model=ApiResponse)
+async def live():
+    '''Процесс жив и обслуживает event loop'''
+    return ApiResponse(result='ok')
+
+
+@router.get('/ready', response_model=ApiResponse, responses={503: {'model': ApiResponse}})
+async def ready():
+    '''Процесс прогрет и не останавливается - можно направлять трафик'''
+    lifecycle = get_lifecycle()
+    if lifecycle.draining:
+        return DRAINING()
+    if not lifecycle.ready:
+        return NOT_READY()
+    return ApiResponse(result='ok', data=lifecycle.timings)
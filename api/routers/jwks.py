@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Request, Response
+
+from authorization.keys import get_key_ring
+from config import settings
+
+
+router = APIRouter(prefix='/.well-known', tags=['jwks'])
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    '''Проверка If-None-Match (слабое сравнение, несколько значений через запятую)'''
+    values = [value.strip().removeprefix('W/') for value in if_none_match.split(',')]
+    return '*' in values or etag in values
+
+
+@router.get('/jwks.json')
+async def jwks(request: Request):
+    '''Открытые ключи для проверки токенов без обращения к API'''
+    keys = get_key_ring()
+    headers = {
+        'ETag': keys.etag,
+        'Cache-Control': f'public, max-age={settings.JWKS_MAX_AGE}',
+    }
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and etag_matches(if_none_match, keys.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(keys.jwks, media_type='application/json', headers=headers)
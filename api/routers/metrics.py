@@ -0,0 +1,80 @@
+from typing import Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from redis.exceptions import RedisError
+
+from authorization.authx import AdminPayloadDep
+from authorization.revocation import get_revocation_list
+from authorization.token_cache import get_token_cache
+from celery_client.publisher import get_task_publisher
+from celery_client.task_metrics import collect_task_durations
+from database.connections import get_db_instance
+from database.user_cache import get_user_cache
+from redis_client.redis import get_redis
+from schemes.responses import ApiResponse
+from services.email import get_email_service
+from services.password import get_password_hasher
+from services.password_rehash import get_password_rehasher
+from services.smtp import AsyncSMTPTransport
+from utils.metrics import Sample, profiler, registry, samples_from_stats
+from utils.rate_limit import get_rate_limiter
+from utils.single_flight import get_single_flight
+
+
+router = APIRouter(prefix='/metrics', tags=['metrics'])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@registry.collector
+def service_stats() -> Iterable[Sample]:
+    '''Текущее состояние кэшей, пулов и очередей процесса'''
+    if (token_cache := get_token_cache()) is not None:
+        yield from samples_from_stats('token_cache', token_cache.stats())
+    if (user_cache := get_user_cache()) is not None:
+        yield from samples_from_stats('user_cache', user_cache.stats())
+    yield from samples_from_stats('single_flight', get_single_flight().stats()['__total__'])
+    yield from samples_from_stats('db_pool', get_db_instance().pool_stats(), label='pool')
+    yield from samples_from_stats('redis_pool', get_redis().stats())
+    yield from samples_from_stats('rate_limit', get_rate_limiter().stats())
+    yield from samples_from_stats('token_revocation', get_revocation_list().stats())
+    yield 'password_hasher_pending', {}, get_password_hasher().pending
+    yield from samples_from_stats('password_rehash', get_password_rehasher().stats())
+
+    publisher = get_task_publisher()
+    yield 'celery_publisher_buffered', {}, publisher.buffered
+    yield 'celery_publisher_published', {}, publisher.published
+    yield 'celery_publisher_dropped', {}, publisher.dropped
+
+    transport = get_email_service().transport
+    if isinstance(transport, AsyncSMTPTransport):
+        yield 'smtp_sent', {}, transport.sent
+        yield 'smtp_failed', {}, transport.failed
+
+    yield 'profiler_enabled', {}, int(profiler.enabled)
+
+
+@router.get('', response_class=PlainTextResponse)
+async def metrics():
+    '''Метрики процесса в текстовом формате Prometheus'''
+    text = registry.render()
+    # длительность задач копят воркеры Celery в Redis
+    try:
+        text += '\n'.join((*(await collect_task_durations(get_redis())).render(), ''))
+    except RedisError:
+        pass
+    return PlainTextResponse(text, media_type=CONTENT_TYPE)
+
+
+@router.post('/profiling/start', response_model=ApiResponse)
+async def start_profiling(payload: AdminPayloadDep):
+    '''Включает cProfile для процесса'''
+    profiler.start()
+    return ApiResponse(result='ok', message='Profiling started')
+
+
+@router.post('/profiling/stop', response_class=PlainTextResponse)
+async def stop_profiling(payload: AdminPayloadDep):
+    '''Выключает cProfile и возвращает отчет по суммарному времени функций'''
+    return PlainTextResponse(profiler.stop())
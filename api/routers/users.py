@@ -0,0 +1,82 @@
+import logging
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from authorization.authx import AdminPayloadDep
+from config import settings
+from database.connections import get_db_instance
+from database.queries import QueriesServiceDep
+from database.user_cache import get_user_cache
+from schemes.responses import ApiResponse, ModelResponse
+from schemes.users import ImportProgressData, UserItem, UserPage
+from services.user_export import MEDIA_TYPES, ExportFormat, export_users
+from services.user_import import (
+    ImportFormat, ImportProgress, UserImporter, get_import_executor, iter_lines, read_rows
+)
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix='/admin/users', tags=['admin'])
+
+
+@router.get('', response_model=ApiResponse[UserPage])
+async def list_users(
+    payload: AdminPayloadDep,
+    db: QueriesServiceDep,
+    after_id: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    '''Пользователи по возрастанию id; следующая страница - after_id=data.next_after_id'''
+    rows = await db.list_users(after_id, limit)
+    items = [UserItem(id=row.id, username=row.username, email=row.email) for row in rows]
+    next_after_id = items[-1].id if len(items) == limit else None
+    return ApiResponse(result='ok', data=UserPage(items=items, next_after_id=next_after_id))
+
+
+@router.get('/export')
+async def export(payload: AdminPayloadDep, format: ExportFormat = 'ndjson'):
+    '''Выгрузка всех пользователей потоком (NDJSON или CSV)'''
+    return StreamingResponse(
+        export_users(get_db_instance().session_factory, format, settings.USER_EXPORT_BATCH_SIZE),
+        media_type=MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="users.{format}"'},
+    )
+
+
+def log_progress(progress: ImportProgress) -> None:
+    logger.info('Импорт пользователей: %s', progress.as_dict())
+
+
+@router.post(
+    '/import',
+    response_model=ApiResponse[ImportProgressData],
+    responses={500: {'model': ApiResponse[ImportProgressData]}},
+)
+async def import_users(
+    request: Request, payload: AdminPayloadDep, format: ImportFormat = 'ndjson', skip: int = 0
+):
+    '''Импортирует пользователей из тела запроса (CSV или NDJSON) потоком.
+
+    skip - номер последней импортированной строки (data.line прерванного импорта).
+    '''
+    progress = ImportProgress(line=skip)
+    # bcrypt импорта не занимает пул хеширования логинов
+    importer = UserImporter(
+        session_factory=get_db_instance().session_factory,
+        cache=get_user_cache(),
+        executor=get_import_executor(),
+        hash_workers=settings.USER_IMPORT_HASH_WORKERS,
+        batch_size=settings.USER_IMPORT_BATCH_SIZE,
+        on_progress=log_progress,
+    )
+    try:
+        await importer.run(read_rows(iter_lines(request.stream()), format), progress)
+    except Exception:
+        logger.exception('Импорт пользователей прерван: %s', progress.as_dict())
+        return ModelResponse(
+            ApiResponse(result='error', message='Import interrupted', data=progress.as_dict()),
+            status_code=500,
+        )
+    return ApiResponse(result='ok', message='Import finished', data=progress.as_dict())
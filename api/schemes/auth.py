@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 
 class SendCodeRequest(BaseModel):
@@ -14,6 +14,21 @@ class SendCodeRequest(BaseModel):
     password: str = Field(
         ..., min_length=8, max_length=128, description="Пароль должен быть не менее 8 символов."
     )
+
+
+class LoginRequest(BaseModel):
+    '''Модель входа: по email (без учета регистра) или по username'''
+    username: str | None = Field(
+        None, min_length=5, max_length=30, pattern=r'^[a-zA-Z0-9]+$'
+    )
+    email: EmailStr | None = None
+    password: str = Field(..., min_length=8, max_length=128)
+
+    @model_validator(mode='after')
+    def login_required(self) -> 'LoginRequest':
+        if self.username is None and self.email is None:
+            raise ValueError('Either email or username is required')
+        return self
     
     
 class VerifyCodeRequest(BaseModel):
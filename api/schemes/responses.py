@@ -1,8 +1,57 @@
-from typing import Any, Literal
+from typing import Any, Generic, Literal, Mapping, TypeVar
 from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
 
 
-class ApiResponse(BaseModel):
+DataT = TypeVar('DataT')
+
+
+class ApiResponse(BaseModel, Generic[DataT]):
     result: Literal['ok', 'error']  # статус выполнения
     message: str | None = None  # описание ошибки или сообщения
-    data: Any | None = None  # дополнительные данные, если нужно
+    data: DataT | None = None  # дополнительные данные, если нужно
+
+
+class TokensData(BaseModel):
+    access_token: str
+    refresh_token: str
+
+
+class ConflictData(BaseModel):
+    conflict: Literal['username', 'email'] | None
+
+
+# параметризованные модели создаются один раз, а не на каждый ответ
+TokensResponse = ApiResponse[TokensData]
+ConflictResponse = ApiResponse[ConflictData]
+
+
+class ModelResponse(Response):
+    '''JSON ответ, который pydantic-core сериализует сразу в байты, без промежуточного dict'''
+
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            # тело уже закодировано (PreparedResponse)
+            return content
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return to_json(content)
+
+
+class PreparedResponse:
+    '''Постоянный ответ об ошибке: тело кодируется один раз при импорте'''
+
+    __slots__ = ('status_code', 'body', 'headers')
+
+    def __init__(
+        self, status_code: int, message: str, headers: Mapping[str, str] | None = None
+    ) -> None:
+        self.status_code = status_code
+        self.body = ModelResponse(ApiResponse(result='error', message=message)).body
+        self.headers = headers
+
+    def __call__(self, headers: Mapping[str, str] | None = None) -> ModelResponse:
+        return ModelResponse(self.body, self.status_code, headers or self.headers)
@@ -0,0 +1,49 @@
+from typing import Any
+
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+
+
+# bcrypt в формате modular crypt: $2b$12$ + 22 символа соли + 31 символ хэша
+BCRYPT_HASH_PATTERN = r'^\$2[aby]?\$\d{2}\$[./A-Za-z0-9]{53}$'
+
+
+class UserImportRow(BaseModel):
+    '''Строка импорта пользователей: пароль открытым текстом или готовый bcrypt хэш'''
+    username: str = Field(..., min_length=5, max_length=30, pattern=r'^[a-zA-Z0-9]+$')
+    email: EmailStr
+    password: str | None = Field(None, min_length=8, max_length=128)
+    password_hash: str | None = Field(None, pattern=BCRYPT_HASH_PATTERN)
+
+    @field_validator('password', 'password_hash', mode='before')
+    @classmethod
+    def empty_to_none(cls, value: Any) -> Any:
+        # пустая ячейка CSV - отсутствие значения
+        return value or None
+
+    @model_validator(mode='after')
+    def one_password(self) -> 'UserImportRow':
+        if (self.password is None) == (self.password_hash is None):
+            raise ValueError('Exactly one of password and password_hash is required')
+        return self
+
+
+class ImportProgressData(BaseModel):
+    line: int  # последняя обработанная строка входа, с нее можно продолжить (?skip=)
+    inserted: int
+    skipped: int  # username или email уже заняты
+    invalid: int
+    errors: list[str]
+    elapsed: float
+    rate: float  # строк в секунду
+
+
+class UserItem(BaseModel):
+    id: int
+    username: str | None
+    email: str
+
+
+class UserPage(BaseModel):
+    items: list[UserItem]
+    # after_id следующей страницы, None - страниц больше нет
+    next_after_id: int | None
@@ -0,0 +1,207 @@
+'''Многопроцессный запуск API.
+
+Родительский процесс один раз импортирует приложение (preload), открывает сокет и
+форкает воркеров uvicorn (uvloop + httptools). Ресурсы (пулы БД и Redis, пул bcrypt,
+публикатор задач) каждый воркер создает сам в lifespan после fork. Воркер завершается
+после max_requests запросов, родитель запускает ему замену.
+
+По SIGTERM воркер сразу снимается с балансировки (/health/ready - 503), еще
+SHUTDOWN_PRESTOP_DELAY секунд обслуживает запросы, пока балансировщик это заметит,
+затем перестает принимать соединения и дожидается запросов в работе.
+
+Запуск из каталога api: python server.py --workers 4
+'''
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from types import FrameType
+from typing import TYPE_CHECKING
+
+import uvicorn
+
+from config import settings
+
+if TYPE_CHECKING:
+    from utils.lifecycle import Lifecycle
+
+
+# логирование настраивает uvicorn.Config
+logger = logging.getLogger('uvicorn.error')
+
+# воркер, упавший быстрее этого времени, перезапускается с задержкой
+CRASH_BACKOFF = 1.0
+
+
+class Supervisor:
+    '''Запускает воркеров и заменяет завершившихся, пока не получен сигнал остановки'''
+
+    def __init__(self, args: argparse.Namespace, sock: socket.socket) -> None:
+        self.args = args
+        self.sock = sock
+        self.workers: dict[int, float] = {}
+        self.stopping = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        # SIGHUP - мягкий перезапуск всех воркеров
+        signal.signal(signal.SIGHUP, self._reload)
+
+        for _ in range(self.args.workers):
+            self._spawn()
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+            started_at = self.workers.pop(pid, None)
+            if started_at is None or self.stopping:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and time.monotonic() - started_at < CRASH_BACKOFF:
+                logger.error('Воркер %s завершился с кодом %s при запуске', pid, code)
+                time.sleep(CRASH_BACKOFF)
+            self._spawn()
+
+    def _spawn(self) -> None:
+        max_requests = self.args.max_requests
+        if max_requests and self.args.max_requests_jitter:
+            # воркеры не должны перезапускаться одновременно
+            max_requests += random.randint(0, self.args.max_requests_jitter)
+
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(self.args, self.sock, max_requests)
+            except BaseException:
+                logger.exception('Ошибка воркера')
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+
+    def _stop(self, signum: int, frame) -> None:
+        self.stopping = True
+        self._terminate_workers()
+
+    def _reload(self, signum: int, frame) -> None:
+        # завершенные воркеры заменяются в основном цикле
+        self._terminate_workers()
+
+    def _terminate_workers(self) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+class DrainingServer(uvicorn.Server):
+    '''uvicorn.Server, который снимает воркер с балансировки до остановки.
+
+    uvicorn выполняет lifespan shutdown, когда соединения уже закрыты, поэтому
+    готовность снимается здесь, в обработчике сигнала, а остановка откладывается.
+    '''
+
+    def __init__(self, config: uvicorn.Config, lifecycle: 'Lifecycle') -> None:
+        super().__init__(config)
+        self.lifecycle = lifecycle
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        lifecycle = self.lifecycle
+        if lifecycle.draining or not lifecycle.ready:
+            # повторный сигнал или воркер еще не принимал трафик - остановка сразу
+            super().handle_exit(sig, frame)
+            return
+        lifecycle.drain()
+        timer = threading.Timer(settings.SHUTDOWN_PRESTOP_DELAY, self._exit, (sig, frame))
+        timer.daemon = True
+        timer.start()
+
+    def _exit(self, sig: int, frame: FrameType | None) -> None:
+        if not self.should_exit:
+            super().handle_exit(sig, frame)
+
+
+def run_worker(args: argparse.Namespace, sock: socket.socket, max_requests: int) -> None:
+    '''Запускает uvicorn в процессе воркера на общем сокете'''
+    # при preload модуль уже импортирован родителем
+    from main import app
+    from utils.lifecycle import get_lifecycle
+
+    config = uvicorn.Config(
+        app,
+        loop='uvloop',
+        http='httptools',
+        lifespan='on',
+        limit_max_requests=max_requests or None,
+        timeout_graceful_shutdown=int(settings.SHUTDOWN_DRAIN_TIMEOUT),
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+    )
+    DrainingServer(config, get_lifecycle()).run(sockets=[sock])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=settings.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=settings.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=settings.SERVER_WORKERS,
+                        help='0 - по числу CPU')
+    parser.add_argument('--max-requests', type=int, default=settings.SERVER_MAX_REQUESTS)
+    parser.add_argument('--max-requests-jitter', type=int,
+                        default=settings.SERVER_MAX_REQUESTS_JITTER)
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        default=settings.SERVER_PRELOAD)
+    args = parser.parse_args()
+    if args.workers <= 0:
+        args.workers = os.cpu_count() or 1
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+
+    cpus = os.cpu_count() or 1
+    if 'PASSWORD_HASHER_WORKERS' not in settings.model_fields_set:
+        # bcrypt отпускает GIL: потоки всех воркеров вместе не должны превышать число CPU
+        settings.PASSWORD_HASHER_WORKERS = max(1, cpus // args.workers)
+
+    sock = uvicorn.Config('main:app', host=args.host, port=args.port).bind_socket()
+    shutdown_budget = (
+        settings.SHUTDOWN_PRESTOP_DELAY
+        + settings.SHUTDOWN_DRAIN_TIMEOUT
+        + settings.SHUTDOWN_CLOSE_TIMEOUT
+    )
+    if shutdown_budget >= settings.SHUTDOWN_GRACE_PERIOD:
+        logger.warning(
+            'Остановка может занять %.0f с, больше SHUTDOWN_GRACE_PERIOD=%.0f с: '
+            'процесс будет убит до закрытия ресурсов',
+            shutdown_budget, settings.SHUTDOWN_GRACE_PERIOD,
+        )
+    if args.preload:
+        # модули импортируются один раз, воркеры разделяют их страницы памяти (copy-on-write)
+        import main  # noqa: F401
+        # объекты импорта не трогает сборщик мусора, страницы не копируются в воркерах
+        gc.freeze()
+
+    logger.info('Запуск %s воркеров на %s:%s', args.workers, args.host, args.port)
+    Supervisor(args, sock).run()
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,85 +1,108 @@
-import json
+import time
+import uuid
 from random import randint
 from typing import Annotated
 
-import bcrypt
-from fastapi.responses import JSONResponse
-from redis.asyncio import Redis
-
-bcrypt.__about__ = bcrypt  # type: ignore
-
-from schemes.responses import ApiResponse
-from redis_client.redis import RedisDep
+from schemes.responses import (
+    ApiResponse,
+    ConflictData,
+    ConflictResponse,
+    ModelResponse,
+    PreparedResponse,
+    TokensData,
+    TokensResponse,
+)
+from redis_client.verify_codes import VerifyCodeStore, VerifyCodeStoreDep
 from database.queries import QueriesService, QueriesServiceDep
-from authx import AuthX, RequestToken
+from authx import AuthX, RequestToken, TokenPayload
 from fastapi import Depends, Request
 from authorization.authx import AuthxDep
-from passlib.context import CryptContext
+from authorization.revocation import RevocationList, RevocationListDep
+from exceptions.handlers.auth import TOKEN_REVOKED
 
-from database.models.user import User
-from schemes.auth import RefreshForm, SendCodeRequest, VerifyCodeRequest
+from schemes.auth import LoginRequest, RefreshForm, SendCodeRequest, VerifyCodeRequest
 from .email import EmailService, EmailServiceDep
+from .password import PasswordHasher, PasswordHasherDep
+from .password_rehash import PasswordRehasher, PasswordRehasherDep
+
+
+INVALID_USERNAME = PreparedResponse(401, 'Invalid username')
+INVALID_EMAIL = PreparedResponse(401, 'Invalid email')
+INVALID_PASSWORD = PreparedResponse(401, 'Invalid password')
+USER_EXISTS = PreparedResponse(409, 'User already exists')
+INVALID_CODE = PreparedResponse(409, 'Invalid code')
+TOKEN_REUSED = PreparedResponse(401, 'Refresh token reuse detected')
+TOKENS_MESSAGE = 'The tokens are located in the data of this response'
 
 
 class AuthService:
-    def __init__(self, db: QueriesService, auth: AuthX, email: EmailService, redis: Redis) -> None:
+    def __init__(
+        self,
+        db: QueriesService,
+        auth: AuthX,
+        email: EmailService,
+        codes: VerifyCodeStore,
+        hasher: PasswordHasher,
+        revocations: RevocationList,
+        rehasher: PasswordRehasher,
+    ) -> None:
         self.db = db
         self.auth = auth
         self.email = email
-        self.redis = redis
+        self.codes = codes
+        self.hasher = hasher
+        self.revocations = revocations
+        self.rehasher = rehasher
 
     async def is_exist_user(self, username: str, email: str) -> bool:
         '''Проверяет существует ли пользователь в системе'''
         return await self.db.is_exist_user(username, email)
 
-    async def add_user(self, creds: SendCodeRequest) -> ApiResponse | JSONResponse:
+    async def add_user(self, creds: SendCodeRequest) -> ModelResponse:
         '''Добавляет пользователя в систему'''
-        password_hashed = self._hash_password(creds.password)
-        user = User(username=creds.username, email=creds.email, password=password_hashed)
-
-        try:
-            await self.db.add_new_user(user)
-            return ApiResponse(result='ok', message='The user has been added')
-        except Exception as ex:
-            if "UNIQUE" in str(ex):
-                return JSONResponse(
-                    status_code=409,
-                    content=ApiResponse(
-                        result='error', message='User already exists'
-                    ).model_dump(),
-                )
-            else:
-                raise ex
-
-    async def login_user(self, creds: SendCodeRequest) -> ApiResponse | JSONResponse:
-        '''Проверяет правильность данных, в случае успеха выдает токен доступа'''
-        # TODO: Переделать на почту
-        user = await self.db.get_user_by_username(creds.username)
-
-        if not user:
-            return JSONResponse(
-                status_code=401,
-                content=ApiResponse(result='error', message='Invalid username').model_dump(),
-            )
-
-        if not self._verify_password(creds.password, user.password):
-            return JSONResponse(
-                status_code=401,
-                content=ApiResponse(result='error', message='Invalid password').model_dump(),
-            )
-
-        access_token = self.auth.create_access_token(uid=creds.username)
-        refresh_token = self.auth.create_refresh_token(uid=creds.username)
-        return ApiResponse(
-            result='ok',
-            message=('The tokens are located in the data of this response'),
-            data={'access_token': access_token, 'refresh_token': refresh_token},
+        password_hashed = await self._hash_password(creds.password)
+        result = await self.db.insert_user(
+            username=creds.username, email=creds.email, password=password_hashed
         )
-
-    async def refresh_token(
-        self, request: Request, refresh_data: RefreshForm
-    ) -> ApiResponse | JSONResponse:
-        '''Выдает новый токен доступа по рефреш токену'''
+        if result.id is None:
+            return ModelResponse(
+                ConflictResponse(
+                    result='error',
+                    message='User already exists',
+                    data=ConflictData(conflict=result.conflict),
+                ),
+                status_code=409,
+            )
+        return ModelResponse(ApiResponse(result='ok', message='The user has been added'))
+
+    async def login_user(self, creds: LoginRequest) -> ModelResponse:
+        '''Проверяет правильность данных, в случае успеха выдает токен доступа.
+
+        Если передан email, пользователь ищется по нему, иначе по username.
+        '''
+        if creds.email is not None:
+            user = await self.db.get_user_by_email(creds.email)
+            if not user:
+                return INVALID_EMAIL()
+        else:
+            user = await self.db.get_user_by_username(creds.username)
+            if not user:
+                return INVALID_USERNAME()
+
+        if not await self._verify_password(creds.password, user.password):
+            return INVALID_PASSWORD()
+        if self.hasher.needs_update(user.password):
+            # хэш со старой схемой или стоимостью: пересчет в фоне, ответ его не ждет
+            self.rehasher.schedule(user, creds.password)
+
+        # новое семейство: все токены, выданные по цепочке обновлений этого входа
+        return self._tokens_response(user.username, family=uuid.uuid4().hex)
+
+    async def refresh_token(self, request: Request, refresh_data: RefreshForm) -> ModelResponse:
+        '''Выдает новую пару токенов по рефреш токену, старый рефреш токен перестает действовать.
+
+        Повторное использование рефреш токена означает его утечку: отзывается все семейство.
+        '''
         try:
             try:
                 payload = await self.auth.refresh_token_required(request)
@@ -93,72 +116,105 @@ class AuthService:
                     verify_type=True,
                 )
 
-            access_token = self.auth.create_access_token(uid=payload.sub)
-            refresh_token = self.auth.create_refresh_token(uid=payload.sub)
-            return ApiResponse(
-                result='ok',
-                message='The tokens are located in the data of this response',
-                data={'access_token': access_token, 'refresh_token': refresh_token},
-            )
         except Exception as ex:
-            return JSONResponse(
-                status_code=401, content=ApiResponse(result='error', message=str(ex)).model_dump()
-            )
-
-    async def send_verify_code(self, creds: SendCodeRequest) -> ApiResponse | JSONResponse:
+            return ModelResponse(ApiResponse(result='error', message=str(ex)), status_code=401)
+
+        # токены, выданные до ротации, не имеют семейства - им служит собственный jti
+        family = getattr(payload, 'fam', None) or payload.jti
+        if await self.revocations.is_revoked(payload.jti, family):
+            return TOKEN_REVOKED()
+        if not await self.revocations.use_refresh(payload.jti, self._expires_at(payload)):
+            await self.revocations.revoke(family, self._family_expires_at())
+            return TOKEN_REUSED()
+        return self._tokens_response(payload.sub, family=family)
+
+    async def logout(self, payload: TokenPayload) -> ModelResponse:
+        '''Отзывает токены входа: все семейство или, для старых токенов, сам токен доступа'''
+        if family := getattr(payload, 'fam', None):
+            await self.revocations.revoke(family, self._family_expires_at())
+        else:
+            await self.revocations.revoke(payload.jti, self._expires_at(payload))
+        return ModelResponse(ApiResponse(result='ok', message='Logged out'))
+
+    async def send_verify_code(self, creds: SendCodeRequest) -> ModelResponse:
         '''Отправляет сообщение на почту пользователя для регистрации'''
         if await self.is_exist_user(username=creds.username, email=creds.email):
-            return JSONResponse(
-                status_code=409,
-                content=ApiResponse(result='error', message='User already exists').model_dump(),
-            )
+            return USER_EXISTS()
 
         secret_code = self._get_random_code()
+        # код сохраняется до отправки, чтобы письмо не пришло раньше, чем код можно проверить
+        await self.codes.save(creds.email, secret_code, creds.model_dump_json())
         await self.email.send_message(
             subject='Подтверждение регистрации',
             body=f'Код подтверждения: {secret_code}',
             to_email=creds.email,
         )
-        await self.redis.set(
-            f'verify_code_{creds.email}',
-            json.dumps({'code': secret_code, **creds.model_dump()}),
-            ex=300,
-        )
-        return ApiResponse(
-            result='ok', message='A message with a secret code was sent to your email'
+        return ModelResponse(
+            ApiResponse(result='ok', message='A message with a secret code was sent to your email')
         )
 
-    async def verify_code(self, verify: VerifyCodeRequest) -> ApiResponse | JSONResponse:
+    async def verify_code(self, verify: VerifyCodeRequest) -> ModelResponse:
         '''Проверяет код с почтой, если связка есть в кэше, то регистрирует пользователя'''
-        if creds := await self.redis.get(f'verify_code_{verify.email}'):
-            creds = json.loads(creds)
-            if creds['code'] == verify.code:
-                await self.add_user(SendCodeRequest(**creds))
-                return ApiResponse(result='ok', message='User is registered')
-        return JSONResponse(
-            status_code=409,
-            content=ApiResponse(result='error', message='Invalid code').model_dump(),
+        if creds := await self.codes.pop(verify.email, verify.code):
+            response = await self.add_user(SendCodeRequest.model_validate_json(creds))
+            if response.status_code != 200:
+                return response
+            return ModelResponse(ApiResponse(result='ok', message='User is registered'))
+        return INVALID_CODE()
+
+    def _tokens_response(self, uid: str, family: str) -> ModelResponse:
+        '''Выдает пару токенов доступа и обновления одного семейства'''
+        data = {'fam': family}
+        return ModelResponse(
+            TokensResponse(
+                result='ok',
+                message=TOKENS_MESSAGE,
+                data=TokensData(
+                    access_token=self.auth.create_access_token(uid=uid, data=data),
+                    refresh_token=self.auth.create_refresh_token(uid=uid, data=data),
+                ),
+            )
         )
 
+    @staticmethod
+    def _expires_at(payload: TokenPayload) -> float:
+        return payload.expiry_datetime.timestamp()
+
+    def _family_expires_at(self) -> float:
+        '''Семейство живет не дольше последнего выданного в нем рефреш токена'''
+        return time.time() + self.auth.config.JWT_REFRESH_TOKEN_EXPIRES.total_seconds()
+
     def _get_random_code(self) -> int:
         '''Выдает случайны код'''
         return randint(1000, 9999)
 
-    def _hash_password(self, password: str) -> str:
+    async def _hash_password(self, password: str) -> str:
         '''Хеширует пароль'''
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.hash(password)
+        return await self.hasher.hash(password)
 
-    def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
         '''Проверяет совпадет ли пароль с хэшем пароля'''
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.verify(plain_password, hashed_password)
+        return await self.hasher.verify(plain_password, hashed_password)
 
 
 def get_auth_service(
-    db: QueriesServiceDep, auth: AuthxDep, email: EmailServiceDep, redis: RedisDep
+    db: QueriesServiceDep,
+    auth: AuthxDep,
+    email: EmailServiceDep,
+    codes: VerifyCodeStoreDep,
+    hasher: PasswordHasherDep,
+    revocations: RevocationListDep,
+    rehasher: PasswordRehasherDep,
 ) -> AuthService:
-    return AuthService(db=db, auth=auth, email=email, redis=redis)
+    return AuthService(
+        db=db,
+        auth=auth,
+        email=email,
+        codes=codes,
+        hasher=hasher,
+        revocations=revocations,
+        rehasher=rehasher,
+    )
 
 
 AuthServiceDep = Annotated[AuthService, Depends(get_auth_service)]
@@ -1,22 +1,62 @@
 from functools import lru_cache
-from typing import Annotated
+from typing import Annotated, Protocol
 
 from fastapi import Depends
 
+from celery_client.publisher import TaskPublisher, get_task_publisher
 from celery_client.tasks import send_email
+from config import settings
+from .smtp import AsyncSMTPTransport
+
+
+class EmailTransport(Protocol):
+    async def send(self, subject: str, body: str, to_email: str) -> None: ...
+
+    async def close(self, timeout: float) -> None: ...
+
+
+class CeleryTransport:
+    '''Отправка почты через воркер Celery'''
+
+    def __init__(self, publisher: TaskPublisher) -> None:
+        self.publisher = publisher
+
+    async def send(self, subject: str, body: str, to_email: str) -> None:
+        await self.publisher.publish(send_email, subject, body, to_email)
+
+    async def close(self, timeout: float) -> None:
+        # буфером публикации владеет приложение, он закрывается в lifespan
+        pass
 
 
 class EmailService:
     '''Сервис для работы с Email'''
 
+    def __init__(self, transport: EmailTransport) -> None:
+        self.transport = transport
+
     async def send_message(self, subject: str, body: str, to_email: str) -> None:
         '''Отправляет сообщение на почту'''
-        send_email.delay(subject, body, to_email)
+        await self.transport.send(subject, body, to_email)
+
+    async def close(self, timeout: float) -> None:
+        '''Дожидается отправки писем в работе'''
+        await self.transport.close(timeout)
 
 
 @lru_cache
 def get_email_service() -> EmailService:
-    return EmailService()
+    if settings.EMAIL_TRANSPORT == 'smtp':
+        transport: EmailTransport = AsyncSMTPTransport(
+            max_concurrency=settings.SMTP_POOL_SIZE,
+            max_pending=settings.SMTP_MAX_PENDING,
+            retries=settings.SMTP_RETRIES,
+            retry_delay=settings.SMTP_RETRY_DELAY,
+            healthcheck_interval=settings.SMTP_POOL_HEALTHCHECK_INTERVAL,
+        )
+    else:
+        transport = CeleryTransport(publisher=get_task_publisher())
+    return EmailService(transport=transport)
 
 
 EmailServiceDep = Annotated[EmailService, Depends(get_email_service)]
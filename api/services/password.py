@@ -0,0 +1,133 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Annotated, Any, Callable, Literal
+
+import bcrypt
+from fastapi import Depends
+from passlib.context import CryptContext
+
+bcrypt.__about__ = bcrypt  # type: ignore
+
+from config import settings
+from exceptions.errors import ServiceOverloadedError
+from utils.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_WAIT
+
+
+PasswordScheme = Literal['bcrypt', 'argon2']
+SCHEMES: tuple[PasswordScheme, ...] = ('bcrypt', 'argon2')
+
+
+def build_context(
+    scheme: PasswordScheme,
+    bcrypt_rounds: int,
+    argon2_time_cost: int,
+    argon2_memory_cost: int,
+    argon2_parallelism: int,
+) -> CryptContext:
+    '''Контекст с активной схемой scheme; вторая схема остается для проверки старых хэшей'''
+    return CryptContext(
+        schemes=[scheme, *(other for other in SCHEMES if other != scheme)],
+        deprecated='auto',
+        # min = max = default: needs_update отмечает и более дешевые, и более дорогие хэши
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__default_rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__max_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+# контекст создается один раз на процесс (в том числе в каждом воркере ProcessPoolExecutor)
+pwd_context = build_context(
+    scheme=settings.PASSWORD_SCHEME,
+    bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    argon2_time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+    argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+    argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+)
+
+
+def hash_password(password: str) -> str:
+    '''Хеширует пароль (блокирующий вызов)'''
+    return pwd_context.hash(password)
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    '''Хеширует пачку паролей: одна задача пула процессов на пачку (блокирующий вызов)'''
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    '''Проверяет совпадет ли пароль с хэшем пароля (блокирующий вызов)'''
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    '''Выполняет хеширование в пуле потоков/процессов с ограничением конкурентности и очереди'''
+
+    def __init__(self, executor: Executor, max_concurrency: int, max_queue: int) -> None:
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        '''Количество задач в работе и в очереди'''
+        return self._pending
+
+    async def hash(self, password: str) -> str:
+        '''Хеширует пароль в пуле'''
+        return await self._run('hash', hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        '''Проверяет пароль в пуле'''
+        return await self._run('verify', verify_password, plain_password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        '''Создан ли хэш другой схемой или с другой стоимостью; только разбор строки хэша'''
+        return pwd_context.needs_update(hashed_password)
+
+    def close(self) -> None:
+        '''Останавливает пул'''
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        '''Ставит задачу в пул, при переполнении очереди сразу отказывает'''
+        if self._pending >= self.max_concurrency + self.max_queue:
+            raise ServiceOverloadedError('Password hasher queue is full')
+
+        self._pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                started_at = time.perf_counter()
+                PASSWORD_HASH_WAIT.observe(started_at - queued_at, operation)
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(self.executor, func, *args)
+                finally:
+                    PASSWORD_HASH_DURATION.observe(time.perf_counter() - started_at, operation)
+        finally:
+            self._pending -= 1
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHasher:
+    workers = settings.PASSWORD_HASHER_WORKERS
+    if settings.PASSWORD_HASHER_EXECUTOR == 'process':
+        executor: Executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+    return PasswordHasher(
+        executor=executor, max_concurrency=workers, max_queue=settings.PASSWORD_HASHER_MAX_QUEUE
+    )
+
+
+PasswordHasherDep = Annotated[PasswordHasher, Depends(get_password_hasher)]
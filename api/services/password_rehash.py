@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from database.connections import get_db_instance
+from database.queries import QueriesService
+from database.records import UserRecord
+from database.user_cache import UserCache, get_user_cache
+from .password import PasswordHasher, get_password_hasher
+
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordRehasher:
+    '''Пересчитывает устаревшие хэши паролей в фоне после успешного входа.
+
+    Ответ на вход пересчета не ждет. Пересчет уступает пул проверкам паролей: если пул
+    занят, он пропускается и повторится при следующем входе, поэтому смена стоимости
+    расходится по пользователям постепенно, без всплеска нагрузки.
+    '''
+
+    def __init__(
+        self,
+        hasher: PasswordHasher,
+        session_factory: async_sessionmaker[AsyncSession],
+        cache: UserCache | None,
+        max_pending: int,
+    ) -> None:
+        self.hasher = hasher
+        self.session_factory = session_factory
+        self.cache = cache
+        self.max_pending = max_pending
+        self.rehashed = 0
+        self.skipped = 0
+        self.failed = 0
+        self._pending: set[asyncio.Task] = set()
+        # пользователи, чей хэш уже пересчитывается
+        self._users: set[int] = set()
+
+    def schedule(self, user: UserRecord, password: str) -> bool:
+        '''Ставит пересчет хэша пользователя в фон; False - пересчет отложен'''
+        if (
+            user.id in self._users
+            or len(self._pending) >= self.max_pending
+            or self.hasher.pending >= self.hasher.max_concurrency
+        ):
+            self.skipped += 1
+            return False
+        self._users.add(user.id)
+        task = asyncio.create_task(self._rehash(user, password))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return True
+
+    async def close(self, timeout: float) -> None:
+        '''Дожидается пересчетов в работе; незавершенные повторятся при следующем входе'''
+        if self._pending:
+            await asyncio.wait(self._pending, timeout=timeout)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'pending': len(self._pending),
+            'rehashed': self.rehashed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+        }
+
+    async def _rehash(self, user: UserRecord, password: str) -> None:
+        try:
+            hashed = await self.hasher.hash(password)
+            async with self.session_factory() as session:
+                # новый хэш пишется, только если пароль не сменили, пока он считался
+                updated = await QueriesService(db=session, cache=self.cache).update_password(
+                    user, hashed
+                )
+        except Exception as e:
+            # пересчет необязателен: любая ошибка только откладывает его до следующего входа
+            self.failed += 1
+            logger.warning('Не удалось пересчитать хэш пароля пользователя %s: %r', user.id, e)
+        else:
+            self.rehashed += int(updated)
+        finally:
+            self._users.discard(user.id)
+
+
+@lru_cache
+def get_password_rehasher() -> PasswordRehasher:
+    return PasswordRehasher(
+        hasher=get_password_hasher(),
+        session_factory=get_db_instance().session_factory,
+        cache=get_user_cache(),
+        max_pending=settings.PASSWORD_REHASH_MAX_PENDING,
+    )
+
+
+PasswordRehasherDep = Annotated[PasswordRehasher, Depends(get_password_rehasher)]
@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import suppress
+from email.message import EmailMessage
+
+from aiosmtplib import SMTP, SMTPException, SMTPRecipientsRefused, SMTPResponseException
+
+from celery_client.smtp import build_message, get_ssl_context
+from config import settings
+from exceptions.errors import ServiceOverloadedError
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSMTPTransport:
+    '''Отправляет почту прямо из процесса API через пул асинхронных SMTP соединений.
+
+    Одновременных отправок не больше max_concurrency, неудачные письма попадают
+    в очередь повторов и отправляются заново с задержкой.
+    '''
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_pending: int,
+        retries: int,
+        retry_delay: float,
+        healthcheck_interval: float,
+    ) -> None:
+        self.max_pending = max_pending
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.healthcheck_interval = healthcheck_interval
+        self.sent = 0
+        self.failed = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._idle: list[tuple[SMTP, float]] = []
+        self._pending: set[asyncio.Task] = set()
+        # куча повторов (ready_at, порядковый номер, письмо, попытка): первым - ближайший по сроку
+        self._retries: list[tuple[float, int, EmailMessage, int]] = []
+        self._retry_order = itertools.count()
+        self._retry_wakeup = asyncio.Event()
+        self._retry_worker: asyncio.Task | None = None
+
+    async def send(self, subject: str, body: str, to_email: str) -> None:
+        '''Ставит письмо на отправку, не дожидаясь ответа SMTP сервера'''
+        if len(self._pending) + len(self._retries) >= self.max_pending:
+            raise ServiceOverloadedError('SMTP transport queue is full')
+        if self._retry_worker is None:
+            self._retry_worker = asyncio.create_task(self._run_retries())
+        self._spawn(build_message(subject, body, to_email), attempt=1)
+
+    async def close(self, timeout: float) -> None:
+        '''Дожидается отправки писем в работе и закрывает соединения'''
+        if self._pending:
+            await asyncio.wait(self._pending, timeout=timeout)
+        if self._retry_worker is not None:
+            self._retry_worker.cancel()
+            self._retry_worker = None
+        if lost := len(self._pending) + len(self._retries):
+            logger.error('Не удалось отправить писем при остановке: %s', lost)
+        while self._idle:
+            client, _ = self._idle.pop()
+            await self._quit(client)
+
+    def _spawn(self, message: EmailMessage, attempt: int) -> None:
+        task = asyncio.create_task(self._deliver(message, attempt))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _deliver(self, message: EmailMessage, attempt: int) -> None:
+        async with self._semaphore:
+            try:
+                client = await self._acquire()
+            except (SMTPException, OSError) as e:
+                self._schedule_retry(message, attempt, e)
+                return
+
+            try:
+                await client.send_message(message)
+            except (SMTPRecipientsRefused, SMTPResponseException) as e:
+                # сервер отклонил письмо, соединение остается рабочим; 5xx повторять бессмысленно
+                self._idle.append((client, time.monotonic()))
+                permanent = isinstance(e, SMTPRecipientsRefused) or e.code >= 500
+                self._schedule_retry(message, self.retries if permanent else attempt, e)
+            except (SMTPException, OSError) as e:
+                await self._quit(client)
+                self._schedule_retry(message, attempt, e)
+            else:
+                self._idle.append((client, time.monotonic()))
+                self.sent += 1
+
+    def _schedule_retry(self, message: EmailMessage, attempt: int, error: Exception) -> None:
+        if attempt >= self.retries:
+            self.failed += 1
+            logger.error('Ошибка при отправке письма на %s: %s', message['To'], error)
+            return
+        ready_at = time.monotonic() + self.retry_delay * attempt
+        heapq.heappush(self._retries, (ready_at, next(self._retry_order), message, attempt + 1))
+        # будить воркер нужно, только если новый повтор стал ближайшим
+        if self._retries[0][2] is message:
+            self._retry_wakeup.set()
+
+    async def _run_retries(self) -> None:
+        '''Возвращает письма из очереди повторов на отправку по истечении задержки.
+
+        За один проход отправляются все повторы, чей срок наступил, затем воркер спит
+        до ближайшего срока или до появления более раннего повтора.
+        '''
+        while True:
+            now = time.monotonic()
+            while self._retries and self._retries[0][0] <= now:
+                _, _, message, attempt = heapq.heappop(self._retries)
+                self._spawn(message, attempt)
+            self._retry_wakeup.clear()
+            timeout = self._retries[0][0] - now if self._retries else None
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._retry_wakeup.wait(), timeout)
+
+    async def _acquire(self) -> SMTP:
+        '''Берет живое соединение из пула или открывает новое'''
+        while self._idle:
+            client, last_used = self._idle.pop()
+            if not client.is_connected:
+                continue
+            if time.monotonic() - last_used < self.healthcheck_interval:
+                return client
+            try:
+                await client.noop()
+                return client
+            except (SMTPException, OSError):
+                client.close()
+
+        client = SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            start_tls=settings.SMTP_STARTTLS,
+            tls_context=get_ssl_context() if settings.SMTP_STARTTLS else None,
+        )
+        await client.connect()
+        try:
+            if client.supports_extension('auth'):
+                await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except BaseException:
+            client.close()
+            raise
+        return client
+
+    async def _quit(self, client: SMTP) -> None:
+        try:
+            await client.quit()
+        except (SMTPException, OSError):
+            client.close()
@@ -0,0 +1,43 @@
+'''Потоковая выгрузка пользователей в NDJSON или CSV.
+
+Строки читаются серверным курсором пачками и сразу кодируются в куски ответа,
+поэтому память не зависит от размера таблицы. Сессия открывается при отправке
+первого куска и закрывается, как только курсор исчерпан или клиент отключился,
+а не вместе с запросом.
+'''
+import csv
+import io
+from typing import AsyncIterator, Literal, Sequence
+
+from pydantic_core import to_json
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.queries import QueriesService
+
+
+ExportFormat = Literal['ndjson', 'csv']
+EXPORT_COLUMNS = ('id', 'username', 'email')
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+
+
+def encode_ndjson(rows: Sequence[Row]) -> bytes:
+    return b''.join(to_json(row._asdict()) + b'\n' for row in rows)
+
+
+def encode_csv(rows: Sequence[Row]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_users(
+    session_factory: async_sessionmaker[AsyncSession], fmt: ExportFormat, batch_size: int
+) -> AsyncIterator[bytes]:
+    '''Куски тела ответа: по одному на пачку строк'''
+    encode = encode_ndjson if fmt == 'ndjson' else encode_csv
+    if fmt == 'csv':
+        yield (','.join(EXPORT_COLUMNS) + '\n').encode()
+    async with session_factory() as session:
+        async for rows in QueriesService(db=session).stream_users(batch_size):
+            yield encode(rows)
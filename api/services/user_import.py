@@ -0,0 +1,344 @@
+'''Массовый импорт пользователей из CSV или NDJSON.
+
+Вход читается потоком построчно, строки собираются в пачки фиксированного размера.
+Пока одна пачка вставляется в БД (одна транзакция), следующая хешируется в пуле
+процессов, поэтому в памяти не больше двух-трех пачек независимо от размера файла.
+После каждой пачки сохраняется номер последней строки: повторный запуск продолжает
+с нее, а уже вставленные строки пропускаются по ON CONFLICT DO NOTHING.
+
+CSV (RFC 4180) - заголовок username,email,password или username,email,password_hash;
+поле в кавычках может содержать перевод строки.
+NDJSON - по объекту с теми же полями на строку.
+'''
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Literal
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from database.queries import QueriesService
+from database.user_cache import UserCache
+from schemes.users import UserImportRow
+from services.password import hash_passwords
+
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal['csv', 'ndjson']
+# строка длиннее - испорченный вход, а не пользователь
+MAX_LINE_LENGTH = 64 * 1024
+# сколько ошибок разбора попадает в отчет
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass(slots=True)
+class ImportProgress:
+    '''Счетчики импорта; line - последняя строка входа, записанная в БД'''
+    line: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    errors: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        '''Обработано строк в секунду'''
+        processed = self.inserted + self.skipped + self.invalid
+        return processed / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), 'rate': round(self.rate, 1)}
+
+
+@dataclass(slots=True)
+class Batch:
+    last_line: int
+    rows: list[dict[str, str]] = field(default_factory=list)
+    # строки, которым нужен хэш: индекс в rows и пароль
+    passwords: list[tuple[int, str]] = field(default_factory=list)
+    invalid: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+class FileCheckpoint:
+    '''Прогресс импорта в JSON файле рядом со входом'''
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def load(self) -> ImportProgress | None:
+        if not self.path.exists():
+            return None
+        data = json.loads(self.path.read_text())
+        data.pop('rate', None)
+        return ImportProgress(**data)
+
+    def save(self, progress: ImportProgress) -> None:
+        # запись через временный файл: при падении остается прежний checkpoint
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(progress.as_dict()))
+        os.replace(tmp, self.path)
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    '''Режет поток байтов на строки, в памяти держится только незаконченная строка'''
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    tail = ''
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split('\n')
+        tail = lines.pop()
+        if len(tail) > MAX_LINE_LENGTH:
+            raise ValueError(f'Line is longer than {MAX_LINE_LENGTH} characters')
+        for line in lines:
+            yield line.rstrip('\r')
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail.rstrip('\r')
+
+
+async def read_file(path: Path, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    '''Читает файл кусками в потоке, не блокируя event loop'''
+    with path.open('rb') as file:
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+
+
+class LineFeed:
+    '''Строки для одного csv.reader на весь поток.
+
+    Читатель получает строки, только когда в буфере целые записи: буфер не кончается
+    внутри поля в кавычках. Поле с переводом строки собирается из нескольких строк.
+    '''
+
+    def __init__(self) -> None:
+        self._lines: deque[str] = deque()
+        self._quoted = False
+        self.size = 0
+
+    def push(self, line: str) -> None:
+        # перевод строки возвращается: внутри кавычек он часть значения
+        self._lines.append(line + '\n')
+        self._quoted = _ends_quoted(line, self._quoted)
+        self.size += len(line)
+
+    @property
+    def pending(self) -> int:
+        return len(self._lines)
+
+    @property
+    def complete(self) -> bool:
+        return bool(self._lines) and not self._quoted
+
+    def __iter__(self) -> 'LineFeed':
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        line = self._lines.popleft()
+        self.size -= len(line) - 1
+        return line
+
+
+def _ends_quoted(line: str, quoted: bool) -> bool:
+    '''Остается ли строка внутри поля в кавычках; правила как у csv.reader по умолчанию'''
+    if '"' not in line:
+        return quoted
+    # кавычка открывает поле только в его начале, "" внутри кавычек - экранированная кавычка
+    state = 'quoted' if quoted else 'start'
+    for char in line:
+        if state == 'quoted':
+            if char == '"':
+                state = 'closed'
+        elif char == ',':
+            state = 'start'
+        elif char == '"' and state in ('start', 'closed'):
+            state = 'quoted'
+        else:
+            state = 'field'
+    return state == 'quoted'
+
+
+async def read_csv_rows(lines: AsyncIterable[str]) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    '''Записи CSV (RFC 4180); номер - последняя строка записи во входе'''
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    header: list[str] | None = None
+
+    async for line in lines:
+        feed.push(line)
+        if not feed.complete:
+            if feed.size > MAX_LINE_LENGTH:
+                raise ValueError(f'Record is longer than {MAX_LINE_LENGTH} characters')
+            continue
+        while feed.pending:
+            try:
+                values = next(reader)
+            except csv.Error as e:
+                yield reader.line_num, f'invalid CSV: {e}'
+                continue
+            if not values or not any(value.strip() for value in values):
+                continue
+            if header is None:
+                header = [value.strip() for value in values]
+                continue
+            yield reader.line_num, dict(zip(header, values))
+
+    if feed.pending:
+        yield reader.line_num + feed.pending, 'invalid CSV: unterminated quoted field'
+
+
+async def read_rows(
+    lines: AsyncIterable[str], fmt: ImportFormat
+) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    '''Номер строки и ее поля или текст ошибки разбора; пустые строки пропускаются'''
+    if fmt == 'csv':
+        async for row in read_csv_rows(lines):
+            yield row
+        return
+
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield number, f'invalid JSON: {e}'
+            continue
+        yield number, data if isinstance(data, dict) else 'JSON object expected'
+
+
+class UserImporter:
+    '''Хеширует пароли пачками в пуле процессов и вставляет пачки в БД'''
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        cache: UserCache | None,
+        executor: Executor,
+        hash_workers: int,
+        batch_size: int,
+        checkpoint: FileCheckpoint | None = None,
+        on_progress: Callable[[ImportProgress], None] | None = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self.cache = cache
+        self.executor = executor
+        self.hash_workers = hash_workers
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.on_progress = on_progress
+
+    async def run(
+        self,
+        rows: AsyncIterable[tuple[int, dict[str, Any] | str]],
+        progress: ImportProgress | None = None,
+    ) -> ImportProgress:
+        '''Импортирует строки после progress.line; при ошибке progress содержит точку продолжения'''
+        progress = progress or ImportProgress()
+        started = time.monotonic() - progress.elapsed
+        # хешированные пачки ждут вставки; размер очереди ограничивает память
+        batches: asyncio.Queue[Batch | None] = asyncio.Queue(maxsize=2)
+        start_line = progress.line
+
+        async def produce() -> None:
+            batch = Batch(last_line=start_line)
+            async for number, data in rows:
+                if number <= start_line:
+                    continue
+                batch.last_line = number
+                self._add_row(batch, number, data)
+                if len(batch.rows) + batch.invalid >= self.batch_size:
+                    await batches.put(await self._hash(batch))
+                    batch = Batch(last_line=number)
+            if batch.rows or batch.invalid:
+                await batches.put(await self._hash(batch))
+            await batches.put(None)
+
+        async def consume() -> None:
+            while (batch := await batches.get()) is not None:
+                inserted = 0
+                if batch.rows:
+                    async with self.session_factory() as session:
+                        inserted = await QueriesService(db=session, cache=self.cache).insert_users(
+                            batch.rows
+                        )
+                progress.line = batch.last_line
+                progress.inserted += inserted
+                progress.skipped += len(batch.rows) - inserted
+                progress.invalid += batch.invalid
+                free = MAX_REPORTED_ERRORS - len(progress.errors)
+                progress.errors.extend(batch.errors[:max(0, free)])
+                progress.elapsed = time.monotonic() - started
+                if self.checkpoint is not None:
+                    self.checkpoint.save(progress)
+                if self.on_progress is not None:
+                    self.on_progress(progress)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                group.create_task(consume())
+        finally:
+            progress.elapsed = time.monotonic() - started
+        return progress
+
+    @staticmethod
+    def _add_row(batch: Batch, number: int, data: dict[str, Any] | str) -> None:
+        try:
+            if isinstance(data, str):
+                raise ValueError(data)
+            row = UserImportRow.model_validate(data)
+        except (ValidationError, ValueError) as e:
+            batch.invalid += 1
+            message = e.errors()[0]['msg'] if isinstance(e, ValidationError) else str(e)
+            batch.errors.append(f'line {number}: {message}')
+            return
+
+        if row.password is not None:
+            batch.passwords.append((len(batch.rows), row.password))
+        batch.rows.append(
+            {'username': row.username, 'email': row.email, 'password': row.password_hash or ''}
+        )
+
+    async def _hash(self, batch: Batch) -> Batch:
+        '''Хеширует пароли пачки, по одной задаче пула на каждый процесс'''
+        if not batch.passwords:
+            return batch
+        loop = asyncio.get_running_loop()
+        size = -(-len(batch.passwords) // self.hash_workers)
+        chunks = [batch.passwords[i:i + size] for i in range(0, len(batch.passwords), size)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, hash_passwords, [password for _, password in chunk])
+            for chunk in chunks
+        ))
+        for chunk, hashes in zip(chunks, results):
+            for (index, _), hashed in zip(chunk, hashes):
+                batch.rows[index]['password'] = hashed
+        batch.passwords.clear()
+        return batch
+
+
+@lru_cache
+def get_import_executor() -> ProcessPoolExecutor:
+    '''Пул процессов bcrypt для импорта через API, отдельный от пула хеширования логинов.
+
+    Один на процесс API: процессы запускаются при первом импорте и не пересоздаются
+    на каждый запрос, а остановка пула не блокирует event loop.
+    '''
+    return ProcessPoolExecutor(settings.USER_IMPORT_HASH_WORKERS)
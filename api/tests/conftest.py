@@ -0,0 +1,106 @@
+'''Приложение на временной SQLite и fakeredis: тесты не требуют внешних сервисов.
+
+Запуск из каталога api:
+    pip install -r requirements.txt -r tests/requirements.txt
+    python -m pytest
+'''
+import itertools
+import os
+import tempfile
+
+# настройки читаются при импорте config, поэтому окружение задается до импорта приложения
+DATABASE_URL = f'sqlite+aiosqlite:///{tempfile.mkdtemp(prefix="quickstart-tests-")}/tests.db'
+os.environ.update({
+    'DEBUG': 'false',
+    'DATABASE_DEV_URL': DATABASE_URL,
+    'DATABASE_PROD_URL': DATABASE_URL,
+    'AUTH_SECRET_KEY': 'tests',
+    'CELERY_BROKER_URL': 'memory://',
+    'SMTP_HOST': '127.0.0.1',
+    'SMTP_PORT': '25',
+    'SMTP_USER': 'tests@example.com',
+    'SMTP_PASSWORD': 'tests',
+    'RATE_LIMIT_ENABLED': 'false',
+    # fakeredis не отвечает на PING проверки здоровья соединения
+    'REDIS_HEALTH_CHECK_INTERVAL': '0',
+    'PASSWORD_BCRYPT_ROUNDS': '4',
+})
+
+from functools import partial
+
+import fakeredis
+import httpx
+import pytest
+from fakeredis.aioredis import FakeAsyncRedisConnection
+from redis.asyncio import BlockingConnectionPool, Redis
+
+import redis_client.redis
+
+redis_client.redis.BlockingConnectionPool = partial(  # type: ignore[misc]
+    BlockingConnectionPool, connection_class=FakeAsyncRedisConnection, server=fakeredis.FakeServer()
+)
+
+from database.connections import get_db_instance
+from database.models.base import Base
+from main import app as application
+from redis_client.redis import get_redis
+from redis_client.verify_codes import VerifyCodeStore
+
+
+PASSWORD = 'password123'
+_users = itertools.count()
+
+
+@pytest.fixture(scope='session')
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture(scope='session')
+async def app():
+    async with get_db_instance().engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with application.router.lifespan_context(application):
+        yield application
+
+
+@pytest.fixture
+async def client(app) -> httpx.AsyncClient:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url='http://tests'
+    ) as client:
+        yield client
+
+
+@pytest.fixture
+def redis(app) -> Redis:
+    return get_redis()
+
+
+@pytest.fixture
+def creds() -> dict[str, str]:
+    '''Данные нового пользователя, уникальные в рамках запуска'''
+    number = next(_users)
+    return {'username': f'user{number}', 'email': f'user{number}@example.com', 'password': PASSWORD}
+
+
+@pytest.fixture
+def send_code(client: httpx.AsyncClient, redis: Redis):
+    '''Запрашивает код подтверждения и возвращает его (письмо не читается)'''
+    async def send(creds: dict[str, str]) -> int:
+        response = await client.post('/api/auth/registration/send-code', json=creds)
+        assert response.status_code == 200, response.text
+        code_key, _ = VerifyCodeStore.keys(creds['email'])
+        return int(await redis.hget(code_key, 'code'))
+    return send
+
+
+@pytest.fixture
+async def registered(client: httpx.AsyncClient, send_code, creds: dict[str, str]) -> dict[str, str]:
+    '''Зарегистрированный пользователь'''
+    code = await send_code(creds)
+    response = await client.post(
+        '/api/auth/registration/verify-code', json={'email': creds['email'], 'code': code}
+    )
+    assert response.status_code == 200, response.text
+    return creds
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from database.connections import get_db_instance
+from database.models.user import User
+
+
+pytestmark = pytest.mark.anyio
+
+
+def other_case(email: str) -> str:
+    local, domain = email.split('@')
+    return f'{local.upper()}@{domain}'
+
+
+async def test_index_rejects_email_in_other_case(app, creds):
+    engine = get_db_instance().engine
+    async with engine.begin() as conn:
+        await conn.execute(insert(User).values(**creds))
+
+    with pytest.raises(IntegrityError):
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(User).values(
+                    username=f'{creds["username"]}x', email=other_case(creds['email']), password='x'
+                )
+            )
+
+
+async def test_send_code_rejects_registered_email_in_other_case(client, registered):
+    response = await client.post(
+        '/api/auth/registration/send-code',
+        json={**registered, 'username': f'{registered["username"]}x', 'email': other_case(registered['email'])},
+    )
+    assert response.status_code == 409
+
+
+async def test_concurrent_registrations_conflict_on_email(client, send_code, creds):
+    # оба кода выданы до регистрации: проверка при send-code их не различает, решает индекс
+    second = {**creds, 'username': f'{creds["username"]}x', 'email': other_case(creds['email'])}
+    first_code = await send_code(creds)
+    second_code = await send_code(second)
+
+    response = await client.post(
+        '/api/auth/registration/verify-code', json={'email': creds['email'], 'code': first_code}
+    )
+    assert response.status_code == 200, response.text
+    response = await client.post(
+        '/api/auth/registration/verify-code', json={'email': second['email'], 'code': second_code}
+    )
+    assert response.status_code == 409
+    assert response.json()['data'] == {'conflict': 'email'}
+
+
+async def test_login_by_email_ignores_case(client, registered):
+    response = await client.post(
+        '/api/auth/login',
+        json={'email': other_case(registered['email']), 'password': registered['password']},
+    )
+    assert response.status_code == 200, response.text
@@ -0,0 +1,55 @@
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def login(client, creds) -> dict[str, str]:
+    response = await client.post('/api/auth/login', json=creds)
+    assert response.status_code == 200, response.text
+    return response.json()['data']
+
+
+async def refresh(client, tokens):
+    return await client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+
+
+async def test_refresh_rotates_tokens(client, registered):
+    tokens = await login(client, registered)
+
+    response = await refresh(client, tokens)
+    assert response.status_code == 200, response.text
+    rotated = response.json()['data']
+    assert rotated['refresh_token'] != tokens['refresh_token']
+
+    response = await client.get('/protected', headers={'Authorization': f'Bearer {rotated["access_token"]}'})
+    assert response.status_code == 200, response.text
+
+
+async def test_refresh_reuse_revokes_family(client, registered):
+    tokens = await login(client, registered)
+    rotated = (await refresh(client, tokens)).json()['data']
+
+    # повторное использование уже обмененного refresh токена - признак утечки
+    response = await refresh(client, tokens)
+    assert response.status_code == 401
+    assert response.json()['message'] == 'Refresh token reuse detected'
+
+    # отзывается все семейство, включая токены, выданные после утекшего
+    response = await refresh(client, rotated)
+    assert response.status_code == 401
+    assert response.json()['message'] == 'Token has been revoked'
+    response = await client.get('/protected', headers={'Authorization': f'Bearer {rotated["access_token"]}'})
+    assert response.status_code == 401
+
+
+async def test_refresh_reuse_keeps_other_sessions(client, registered):
+    leaked = await login(client, registered)
+    other = await login(client, registered)
+
+    await refresh(client, leaked)
+    assert (await refresh(client, leaked)).status_code == 401
+
+    # семейство другого входа того же пользователя не затронуто
+    response = await refresh(client, other)
+    assert response.status_code == 200, response.text
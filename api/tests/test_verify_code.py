@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from redis_client.verify_codes import VerifyCodeStore
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def verify(client, email: str, code: int):
+    return await client.post('/api/auth/registration/verify-code', json={'email': email, 'code': code})
+
+
+def wrong(code: int) -> int:
+    return code + 1 if code < 9999 else 1000
+
+
+async def test_verify_code_registers_once(client, send_code, creds):
+    code = await send_code(creds)
+
+    response = await verify(client, creds['email'], code)
+    assert response.status_code == 200, response.text
+
+    # код забирается вместе с данными регистрации: повтор не срабатывает
+    response = await verify(client, creds['email'], code)
+    assert response.status_code == 409
+    assert response.json()['message'] == 'Invalid code'
+
+
+async def test_concurrent_replay_registers_once(client, send_code, creds):
+    code = await send_code(creds)
+
+    responses = await asyncio.gather(*(verify(client, creds['email'], code) for _ in range(5)))
+
+    assert sorted(response.status_code for response in responses) == [200, 409, 409, 409, 409]
+
+
+async def test_code_burns_after_max_attempts(client, redis, send_code, creds):
+    code = await send_code(creds)
+
+    for _ in range(settings.VERIFY_CODE_MAX_ATTEMPTS):
+        assert (await verify(client, creds['email'], wrong(code))).status_code == 409
+
+    assert (await verify(client, creds['email'], code)).status_code == 409
+    assert not await redis.exists(*VerifyCodeStore.keys(creds['email']))
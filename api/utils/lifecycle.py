@@ -0,0 +1,187 @@
+'''Запуск и остановка процесса API: создание ресурсов, прогрев, готовность и drain.'''
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator
+
+from authx import RequestToken
+from redis.exceptions import RedisError
+from sqlalchemy import text
+
+from authorization.authx import get_auth
+from authorization.revocation import get_revocation_list
+from authorization.token_cache import get_token_cache
+from celery_client.publisher import get_task_publisher
+from config import settings
+from database.connections import get_db_instance
+from database.user_cache import get_user_cache
+from redis_client.redis import get_redis
+from redis_client.verify_codes import VERIFY_SCRIPT, get_verify_code_store
+from services.email import get_email_service
+from services.password import get_password_hasher
+from services.password_rehash import get_password_rehasher
+from services.user_import import get_import_executor
+from utils.rate_limit import SLIDING_WINDOW_SCRIPT, get_rate_limiter
+from utils.single_flight import get_single_flight
+
+
+logger = logging.getLogger(__name__)
+
+# фабрики ресурсов, которые нельзя разделять между процессами
+RESOURCE_FACTORIES = (
+    get_db_instance,
+    get_redis,
+    get_auth,
+    get_token_cache,
+    get_revocation_list,
+    get_user_cache,
+    get_single_flight,
+    get_verify_code_store,
+    get_rate_limiter,
+    get_password_hasher,
+    get_password_rehasher,
+    get_import_executor,
+    get_task_publisher,
+    get_email_service,
+)
+
+
+class Lifecycle:
+    '''Состояние процесса: прогрет ли он и идет ли остановка'''
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.draining = False
+        # длительность шагов запуска в секундах
+        self.timings: dict[str, float] = {}
+
+    async def startup(self) -> None:
+        '''Создает ресурсы и прогревает их до того, как процесс начнет принимать трафик'''
+        start = time.perf_counter()
+        with self._timed('resources'):
+            create_resources()
+        if settings.WARMUP_ENABLED:
+            with self._timed('warmup_db'):
+                await warmup_db(settings.WARMUP_DB_CONNECTIONS)
+            with self._timed('warmup_redis'):
+                await warmup_redis(settings.WARMUP_REDIS_CONNECTIONS)
+            with self._timed('warmup_password_hasher'):
+                await warmup_password_hasher()
+            with self._timed('warmup_jwt'):
+                warmup_jwt()
+        # фильтр отзыва синхронизируется в фоне, до этого проверки идут в Redis
+        get_revocation_list().start()
+        self.timings['startup'] = time.perf_counter() - start
+        self.ready = True
+        logger.info('API готов за %.3f с: %s', self.timings['startup'], self.timings)
+
+    def drain(self) -> None:
+        '''Снимает процесс с балансировки: /health/ready отвечает 503'''
+        self.ready = False
+        self.draining = True
+
+    async def shutdown(self) -> None:
+        '''Закрывает ресурсы; запросы в работе к этому моменту уже дождался uvicorn'''
+        self.drain()
+        await close_resources()
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+
+def create_resources() -> None:
+    '''Вызывает фабрики ресурсов, чтобы первый запрос не платил за их создание'''
+    for factory in RESOURCE_FACTORIES:
+        factory()
+
+
+async def warmup_db(connections: int) -> None:
+    '''Открывает соединения пулов основной БД и реплик; ошибка подключения останавливает запуск'''
+    db = get_db_instance()
+
+    async def ping(engine) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    for engine in (db.engine, *db.replicas):
+        # соединения берутся одновременно, иначе пул вернет одно и то же
+        await asyncio.gather(*(ping(engine) for _ in range(connections)))
+
+
+async def warmup_redis(connections: int) -> None:
+    '''Открывает соединения пула Redis и загружает Lua скрипты; без Redis сервис работает'''
+    redis = get_redis()
+    try:
+        await asyncio.gather(*(redis.ping() for _ in range(connections)))
+        for script in (SLIDING_WINDOW_SCRIPT, VERIFY_SCRIPT):
+            await redis.script_load(script)
+    except RedisError as e:
+        logger.warning('Не удалось прогреть Redis: %s', e)
+
+
+async def warmup_password_hasher() -> None:
+    '''Запускает воркеры пула bcrypt (потоки или процессы с импортом passlib)'''
+    hasher = get_password_hasher()
+    hashed = await hasher.hash('warmup-password')
+    await asyncio.gather(
+        *(hasher.verify('warmup-password', hashed) for _ in range(hasher.max_concurrency))
+    )
+
+
+def warmup_jwt() -> None:
+    '''Прогоняет выпуск и проверку токена, чтобы загрузить код подписи'''
+    auth = get_auth()
+    token = auth.create_access_token(uid='warmup')
+    auth.verify_token(RequestToken(token=token, type='access', location='headers'))
+
+
+async def close_resources() -> None:
+    '''Закрывает ресурсы в обратном порядке зависимостей, ожидая не дольше SHUTDOWN_CLOSE_TIMEOUT'''
+    deadline = time.monotonic() + settings.SHUTDOWN_CLOSE_TIMEOUT
+
+    def remaining() -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    # письма, задачи в буфере и пересчеты хэшей завершаются до закрытия соединений;
+    # письма могут ставить задачи, поэтому публикатор закрывается после почты
+    await asyncio.gather(
+        get_email_service().close(timeout=remaining()),
+        get_password_rehasher().close(timeout=remaining()),
+    )
+    await get_task_publisher().close(timeout=remaining())
+    await asyncio.to_thread(get_password_hasher().close)
+    # задачи импорта в очереди пула отменяются, остановка ждет в потоке, а не в event loop
+    await asyncio.to_thread(get_import_executor().shutdown, cancel_futures=True)
+    await get_revocation_list().close()
+    redis = get_redis()
+    await redis.aclose()
+    await redis.connection_pool.disconnect()
+    await get_db_instance().dispose()
+
+
+def reset_after_fork() -> None:
+    '''Сбрасывает ресурсы, унаследованные от родителя: каждый воркер создаст свои'''
+    if get_db_instance.cache_info().currsize:
+        db = get_db_instance()
+        for engine in (db.engine, *db.replicas):
+            # соединения принадлежат родителю - не закрываем их, только забываем
+            engine.sync_engine.dispose(close=False)
+    for factory in RESOURCE_FACTORIES:
+        factory.cache_clear()
+    get_lifecycle.cache_clear()
+
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+
+@lru_cache
+def get_lifecycle() -> Lifecycle:
+    return Lifecycle()
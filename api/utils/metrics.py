@@ -0,0 +1,179 @@
+'''Метрики в формате Prometheus.
+
+Все наблюдения делаются из потока event loop, поэтому счетчики - обычные числа без блокировок.
+'''
+import cProfile
+import io
+import pstats
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+Sample = tuple[str, dict[str, str], float]
+
+
+class Histogram:
+    '''Гистограмма с фиксированными бакетами и произвольными метками'''
+
+    def __init__(
+        self, name: str, doc: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.doc = doc
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики бакетов..., +Inf, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def load(self, labels: tuple[str, ...], series: list[float]) -> None:
+        '''Подставляет серию, собранную в другом процессе (счетчики бакетов, +Inf, sum)'''
+        self._series[labels] = series
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.doc}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in self._series.items():
+            base = dict(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series[:-1]):
+                cumulative += count
+                yield _line(f'{self.name}_bucket', {**base, 'le': str(bound)}, cumulative)
+            yield _line(f'{self.name}_sum', base, series[-1])
+            yield _line(f'{self.name}_count', base, cumulative)
+
+
+class Counter:
+    '''Монотонный счетчик с метками'''
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.label_names = labels
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.doc}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self._values.items():
+            yield _line(self.name, dict(zip(self.label_names, labels)), value)
+
+
+class Registry:
+    '''Реестр метрик и коллекторов (функций, отдающих текущие значения при сборе)'''
+
+    def __init__(self) -> None:
+        self.metrics: list[Histogram | Counter] = []
+        self.collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def histogram(
+        self, name: str, doc: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, doc, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, doc: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, doc, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Iterable[Sample]]) -> Callable[[], Iterable[Sample]]:
+        '''Регистрирует функцию, возвращающую (имя, метки, значение) на момент сбора'''
+        self.collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                lines.append(_line(name, labels, value))
+        lines.append('')
+        return '\n'.join(lines)
+
+
+def _line(name: str, labels: dict[str, str], value: float) -> str:
+    if not labels:
+        return f'{name} {value}'
+    rendered = ','.join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+    return f'{name}{{{rendered}}} {value}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def samples_from_stats(
+    prefix: str, stats: dict, labels: dict[str, str] | None = None, label: str = 'key'
+) -> Iterable[Sample]:
+    '''Превращает словарь stats() сервиса в набор gauge значений'''
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from samples_from_stats(prefix, value, {**(labels or {}), label: str(key)})
+        elif isinstance(value, (int, float)):
+            yield f'{prefix}_{key}', labels or {}, value
+
+
+class Profiler:
+    '''cProfile всего процесса, включается и выключается во время работы'''
+
+    def __init__(self) -> None:
+        self._profile: cProfile.Profile | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._profile is not None
+
+    def start(self) -> None:
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self, limit: int = 50) -> str:
+        '''Останавливает профилирование и возвращает топ функций по суммарному времени'''
+        if self._profile is None:
+            return ''
+        self._profile.disable()
+        output = io.StringIO()
+        pstats.Stats(self._profile, stream=output).sort_stats('cumulative').print_stats(limit)
+        self._profile = None
+        return output.getvalue()
+
+
+registry = Registry()
+profiler = Profiler()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'route', 'status')
+)
+DB_QUERY_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'SQL statement execution time', ('statement',)
+)
+REDIS_COMMAND_DURATION = registry.histogram(
+    'redis_command_duration_seconds', 'Redis command latency', ('command',)
+)
+REDIS_COMMAND_ERRORS = registry.counter(
+    'redis_command_errors_total', 'Redis command errors', ('command',)
+)
+PASSWORD_HASH_DURATION = registry.histogram(
+    'password_hash_duration_seconds', 'bcrypt hash/verify time in the worker pool', ('operation',)
+)
+PASSWORD_HASH_WAIT = registry.histogram(
+    'password_hash_wait_seconds', 'Time waiting for a free bcrypt worker', ('operation',)
+)
+CELERY_PUBLISH_DURATION = registry.histogram(
+    'celery_publish_duration_seconds', 'Time to publish a batch of tasks to the broker'
+)
@@ -0,0 +1,148 @@
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+
+from fastapi import Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from config import settings
+from exceptions.errors import RateLimitExceededError
+from redis_client.redis import get_redis
+
+
+# Скользящее окно на sorted set: проверяет все ключи запроса и, только если ни один
+# лимит не превышен, записывает запрос во все окна. Возвращает задержку до повтора в мс.
+SLIDING_WINDOW_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local member = ARGV[2]
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[1 + i * 2])
+    local window = tonumber(ARGV[2 + i * 2])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry_after = math.max(retry_after, tonumber(oldest[2]) + window - now)
+    end
+end
+if retry_after > 0 then
+    return retry_after
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, member)
+    redis.call('PEXPIRE', key, ARGV[2 + i * 2])
+end
+return 0
+'''
+
+
+def parse_limit(limit: str) -> tuple[int, float]:
+    '''"10/60" -> (10 запросов, окно 60 секунд)'''
+    count, window = limit.split('/')
+    return int(count), float(window)
+
+
+class LocalBuckets:
+    '''Token bucket в памяти процесса: отсекает явный флуд без похода в Redis'''
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def take(self, key: str, limit: int, window: float) -> float:
+        '''Забирает токен, возвращает 0 или время до появления следующего токена'''
+        now = time.monotonic()
+        rate = limit / window
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(limit), now]
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            tokens, updated = bucket
+            bucket[0] = min(float(limit), tokens + (now - updated) * rate)
+            bucket[1] = now
+
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / rate
+        bucket[0] -= 1
+        return 0.0
+
+
+class RateLimiter:
+    '''Ограничение частоты запросов: локальный token bucket + скользящее окно в Redis'''
+
+    def __init__(self, redis: Redis, limits: dict[str, dict[str, str]], local_size: int) -> None:
+        self.redis = redis
+        self.limits = {
+            route: {kind: parse_limit(limit) for kind, limit in route_limits.items()}
+            for route, route_limits in limits.items()
+        }
+        self.local = LocalBuckets(local_size)
+        self.rejected_local = 0
+        self.rejected_redis = 0
+        self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    async def check(self, route: str, identities: dict[str, str]) -> None:
+        '''Проверяет лимиты маршрута для ip/username/email, при превышении бросает ошибку'''
+        checks = [
+            (f'rate_limit:{route}:{kind}:{value}', *self.limits[route][kind])
+            for kind, value in identities.items()
+            if value and kind in self.limits.get(route, {})
+        ]
+        if not checks:
+            return
+
+        retry_after = max(self.local.take(key, limit, window) for key, limit, window in checks)
+        if retry_after > 0:
+            self.rejected_local += 1
+            raise RateLimitExceededError(retry_after)
+
+        args: list[str | int | float] = [int(time.time() * 1000), uuid.uuid4().hex]
+        for _, limit, window in checks:
+            args.extend((limit, int(window * 1000)))
+        try:
+            retry_after_ms = await self._script(keys=[key for key, *_ in checks], args=args)
+        except RedisError:
+            # Redis недоступен - пропускаем, локальный лимит все равно действует
+            return
+        if retry_after_ms:
+            self.rejected_redis += 1
+            raise RateLimitExceededError(int(retry_after_ms) / 1000)
+
+    def stats(self) -> dict[str, int]:
+        return {'rejected_local': self.rejected_local, 'rejected_redis': self.rejected_redis}
+
+
+@lru_cache
+def get_rate_limiter() -> RateLimiter:
+    return RateLimiter(
+        redis=get_redis(), limits=settings.RATE_LIMITS, local_size=settings.RATE_LIMIT_LOCAL_SIZE
+    )
+
+
+class RateLimit:
+    '''Dependency маршрута: RateLimit('login') применяет лимиты из settings.RATE_LIMITS['login']'''
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+
+    async def __call__(self, request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        identities = {'ip': request.client.host if request.client else ''}
+        try:
+            # FastAPI уже прочитал тело запроса, json берется из кэша Request
+            body = await request.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            for kind in ('username', 'email'):
+                if isinstance(body.get(kind), str):
+                    identities[kind] = body[kind].lower()
+
+        await get_rate_limiter().check(self.route, identities)
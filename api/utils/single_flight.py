@@ -0,0 +1,110 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Annotated, Awaitable, Callable, TypeVar
+
+from fastapi import Depends
+
+from config import settings
+from exceptions.errors import ServiceOverloadedError
+
+
+T = TypeVar('T')
+
+
+@dataclass(slots=True)
+class FlightStats:
+    calls: int = 0
+    executions: int = 0
+    coalesced: int = 0
+    timeouts: int = 0
+    errors: int = 0
+
+
+class SingleFlight:
+    '''Объединяет одновременные одинаковые запросы: выполняется один, остальные ждут его результат'''
+
+    def __init__(self, timeout: float | None, stats_size: int = 1000) -> None:
+        self.timeout = timeout
+        self.stats_size = stats_size
+        self.total = FlightStats()
+        self._flights: dict[str, tuple[asyncio.Task, list[int]]] = {}
+        self._stats: OrderedDict[str, FlightStats] = OrderedDict()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        '''Выполняет func или присоединяется к уже идущему вызову с тем же ключом'''
+        stats = self._key_stats(key)
+        stats.calls += 1
+        self.total.calls += 1
+
+        flight = self._flights.get(key)
+        if flight is not None and not flight[0].done() and not flight[0].cancelling():
+            task, waiters = flight
+            stats.coalesced += 1
+            self.total.coalesced += 1
+        else:
+            task = asyncio.ensure_future(func())
+            waiters = [0]
+            self._flights[key] = (task, waiters)
+            task.add_done_callback(lambda done: self._forget(key, done))
+            stats.executions += 1
+            self.total.executions += 1
+
+        waiters[0] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            self.total.timeouts += 1
+            raise ServiceOverloadedError(f'Lookup {key!r} timed out')
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.errors += 1
+            self.total.errors += 1
+            raise
+        finally:
+            waiters[0] -= 1
+            # никто больше не ждет результат - вызов отменяется
+            if waiters[0] == 0 and not task.done():
+                task.cancel()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        '''Статистика по ключам (последние stats_size) и суммарная'''
+        result = {key: _as_dict(stats) for key, stats in self._stats.items()}
+        result['__total__'] = _as_dict(self.total)
+        return result
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        flight = self._flights.get(key)
+        if flight is not None and flight[0] is task:
+            del self._flights[key]
+
+    def _key_stats(self, key: str) -> FlightStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = FlightStats()
+            while len(self._stats) > self.stats_size:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+
+def _as_dict(stats: FlightStats) -> dict[str, int]:
+    return {
+        'calls': stats.calls,
+        'executions': stats.executions,
+        'coalesced': stats.coalesced,
+        'timeouts': stats.timeouts,
+        'errors': stats.errors,
+    }
+
+
+@lru_cache
+def get_single_flight() -> SingleFlight:
+    return SingleFlight(timeout=settings.SINGLE_FLIGHT_TIMEOUT)
+
+
+SingleFlightDep = Annotated[SingleFlight, Depends(get_single_flight)]